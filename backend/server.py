@@ -1,36 +1,225 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Request, Response, status
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import CursorType, ReturnDocument, UpdateOne, monitoring
+from pymongo.errors import CollectionInvalid, DuplicateKeyError
 import os
+import time
+import asyncio
 import logging
 from pathlib import Path
 from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from typing import Dict, List, Optional
 import uuid
+import json
+import base64
+import hashlib
+import re
+import unicodedata
+import bisect
+import heapq
+import math
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from email.utils import format_datetime, parsedate_to_datetime
 from datetime import datetime, timezone, timedelta
 import jwt
 import bcrypt
 
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# ============== METRICS ==============
+#
+# Plain counters and fixed-bucket histograms, rendered in the Prometheus
+# text format by GET /api/metrics. Recording is a dict lookup and a bisect;
+# everything else happens at scrape time.
+
+METRIC_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+class Histogram:
+    def __init__(self, buckets=METRIC_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+# With QUERY_DEBUG on, the Mongo commands of the current request, as
+# "command:collection". Motor copies the context into its worker threads,
+# so the listener below sees the request that issued each command.
+request_queries: ContextVar[Optional[list]] = ContextVar("request_queries", default=None)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    # pymongo calls these from Motor's worker threads, hence the lock
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latency = {}  # command name -> Histogram
+        self.failures = {}  # command name -> count
+
+    def started(self, event):
+        queries = request_queries.get()
+        if queries is not None:
+            target = event.command.get(event.command_name)
+            queries.append(f"{event.command_name}:{target}" if isinstance(target, str) else event.command_name)
+
+    def succeeded(self, event):
+        self._observe(event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        with self._lock:
+            self.failures[event.command_name] = self.failures.get(event.command_name, 0) + 1
+        self._observe(event.command_name, event.duration_micros / 1e6)
+
+    def _observe(self, name: str, seconds: float):
+        with self._lock:
+            histogram = self.latency.get(name)
+            if histogram is None:
+                histogram = self.latency[name] = Histogram()
+            histogram.observe(seconds)
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.open = 0
+        self.checked_out = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+        self.cleared = 0
+
+    def _add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                setattr(self, name, getattr(self, name) + delta)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._add(cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._add(open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._add(open=-1)
+
+    def connection_check_out_started(self, event):
+        self._add(waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._add(waiting=-1, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        self._add(waiting=-1, checked_out=1)
+
+    def connection_checked_in(self, event):
+        self._add(checked_out=-1)
+
+class RequestMetrics:
+    # Only touched from the event loop
+    def __init__(self):
+        self.in_flight = 0
+        self.counts = {}  # (method, route, status) -> count
+        self.latency = {}  # (method, route) -> Histogram
+        self.bcrypt_pending = 0  # hashes queued or running on the bcrypt pool
+
+    def observe(self, method: str, route: str, status_code: int, seconds: float):
+        key = (method, route, status_code)
+        self.counts[key] = self.counts.get(key, 0) + 1
+        histogram = self.latency.get((method, route))
+        if histogram is None:
+            histogram = self.latency[(method, route)] = Histogram()
+        histogram.observe(seconds)
+
+mongo_command_metrics = MongoCommandMetrics()
+mongo_pool_metrics = MongoPoolMetrics()
+request_metrics = RequestMetrics()
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_command_metrics, mongo_pool_metrics])
 db = client[os.environ['DB_NAME']]
 
 # JWT Config
 JWT_SECRET = os.environ.get('JWT_SECRET', 'workforce-secret-key-2024')
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 24
+# Live events: a stream ticket only has to last until the EventSource connects
+EVENT_TICKET_SECONDS = 60
+
+# Notes list: characters of content returned as a preview
+NOTE_PREVIEW_CHARS = 280
+
+# Search: characters of context returned around the first match
+SEARCH_SNIPPET_CHARS = 160
+
+# Dashboard stats are served from memory for this long unless a write invalidates them
+DASHBOARD_CACHE_SECONDS = float(os.environ.get('DASHBOARD_CACHE_SECONDS', '10'))
+
+# Stats counters are rebuilt from the raw collections this often (drift is logged)
+STATS_RECONCILE_SECONDS = float(os.environ.get('STATS_RECONCILE_SECONDS', '3600'))
+
+# Daily trend rollups are brought up to date this often
+ROLLUP_INTERVAL_SECONDS = float(os.environ.get('ROLLUP_INTERVAL_SECONDS', '300'))
+
+# Reminders: "due soon" fires this long before a deadline; deadlines further
+# out than the horizon are loaded when the horizon is reached
+REMINDER_DUE_SOON_HOURS = float(os.environ.get('REMINDER_DUE_SOON_HOURS', '24'))
+REMINDER_HORIZON_DAYS = float(os.environ.get('REMINDER_HORIZON_DAYS', '7'))
+
+# Revisions: before answering 304, a worker re-reads the shared counters if
+# its copy is older than this (a change may have missed the invalidation bus)
+REVISION_REFRESH_SECONDS = float(os.environ.get('REVISION_REFRESH_SECONDS', '1'))
+
+# Task board: completed tasks older than this are left off the board
+BOARD_COMPLETED_DAYS = int(os.environ.get('BOARD_COMPLETED_DAYS', '30'))
+
+# Password hashing runs on its own small pool instead of the event loop
+BCRYPT_WORKERS = int(os.environ.get('BCRYPT_WORKERS', '2'))
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_WORKERS, thread_name_prefix="bcrypt")
+
+# Scrapers may authenticate with this instead of an admin token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Debugging only: report each request's Mongo commands in X-Query-Count /
+# X-Queries and log requests that issue more than QUERY_BUDGET of them
+QUERY_DEBUG = os.environ.get('QUERY_DEBUG', '').lower() in ('1', 'true', 'yes')
+QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', '16'))
 
 # Security
 security = HTTPBearer()
+# For endpoints that also accept the token as a query parameter (EventSource can't set headers)
+optional_security = HTTPBearer(auto_error=False)
 
 # Create the main app
-app = FastAPI(title="Workforce Portal API")
+# orjson for every JSON body; the hot read routes also skip response
+# validation, see trusted_json
+app = FastAPI(title="Workforce Portal API", default_response_class=ORJSONResponse)
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -98,6 +287,9 @@ class Task(TaskBase):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     created_by: str = ""
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
+    completed_at: Optional[str] = None  # ISO timestamp of the last move to "completed"
+    started_at: Optional[str] = None  # ISO timestamp of the first move to "in_progress"
+    status_changed_at: Optional[str] = None  # ISO timestamp of the last status change
 
 class NoteBase(BaseModel):
     title: str
@@ -191,20 +383,73 @@ class ReportCreate(ReportBase):
 class ReportUpdate(BaseModel):
     content: Optional[str] = None
 
+class ReportDeltaOp(BaseModel):
+    pos: int  # offset in the current content
+    delete: int = 0  # number of characters removed at pos
+    insert: str = ""  # text inserted at pos
+
+class ReportPatch(BaseModel):
+    base_version: int  # version the ops were computed against
+    ops: List[ReportDeltaOp]
+
 class Report(ReportBase):
     model_config = ConfigDict(extra="ignore")
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str = ""
+    version: int = 0
     created_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
     updated_at: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
+# ============== RESPONSE MODELS ==============
+# What the read routes return, for the API docs. Those routes pass their
+# already-shaped Mongo documents to trusted_json, so the models are not used
+# to re-validate every response.
+
+class UserOut(User):
+    updated_at: Optional[str] = None
+
+class TaskOut(Task):
+    updated_at: Optional[str] = None
+    assignees: List[UserOut] = []
+
+class NoteListItem(BaseModel):
+    id: str
+    title: Optional[str] = None
+    color: Optional[str] = None
+    created_by: Optional[str] = None
+    created_at: Optional[str] = None
+    preview: Optional[str] = None  # the first NOTE_PREVIEW_CHARS of the content
+    truncated: Optional[bool] = None
+    creator_name: Optional[str] = None
+
+class ClientOut(Client):
+    updated_at: Optional[str] = None
+
+class ReportOut(Report):
+    user: Optional[UserOut] = None
+
+class BootstrapOut(BaseModel):
+    user: UserOut
+    stats: dict
+    tasks: List[TaskOut]
+    users: Optional[List[UserOut]] = None  # admins only
+    clients: Optional[List[ClientOut]] = None  # admins only
+
 # ============== HELPERS ==============
 
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+async def run_bcrypt(func, *args):
+    request_metrics.bcrypt_pending += 1
+    try:
+        return await asyncio.get_running_loop().run_in_executor(bcrypt_executor, func, *args)
+    finally:
+        request_metrics.bcrypt_pending -= 1
+
+async def hash_password(password: str) -> str:
+    hashed = await run_bcrypt(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt())
+    return hashed.decode('utf-8')
 
-def verify_password(password: str, hashed: str) -> bool:
-    return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
+async def verify_password(password: str, hashed: str) -> bool:
+    return await run_bcrypt(bcrypt.checkpw, password.encode('utf-8'), hashed.encode('utf-8'))
 
 def create_token(user_id: str, email: str, role: str) -> str:
     payload = {
@@ -215,21 +460,825 @@ def create_token(user_id: str, email: str, role: str) -> str:
     }
     return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+def decode_token(token: Optional[str], purpose: Optional[str] = None) -> dict:
+    # Session tokens have no purpose; other tokens (stream tickets) are only
+    # accepted where that purpose is expected
+    if not token:
+        raise HTTPException(status_code=401, detail="Token invalid")
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
-        return payload
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirat")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Token invalid")
+    if payload.get("purpose") != purpose:
+        raise HTTPException(status_code=401, detail="Token invalid")
+    return payload
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> dict:
+    scope = batch_scope.get()
+    if scope is not None and scope.token == credentials.credentials:
+        # Sub-request of /api/batch: the token was decoded once for the batch
+        return scope.user
+    return decode_token(credentials.credentials)
 
 async def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Acces interzis. Doar administratorii pot efectua această acțiune.")
     return current_user
 
+async def load_users(user_ids, projection: Optional[dict] = None) -> dict:
+    # One batched lookup, keyed by user id
+    user_ids = list({uid for uid in user_ids if uid})
+    if not user_ids:
+        return {}
+    projection = projection or {"_id": 0, "password_hash": 0}
+    if any(v for k, v in projection.items() if k != "_id"):
+        # Inclusion projection: make sure the key comes back
+        projection = {**projection, "id": 1}
+    scope = batch_scope.get()
+    if scope is not None:
+        directory = await scope.directory()
+        return {uid: project_document(directory[uid], projection) for uid in user_ids if uid in directory}
+    return {user["id"]: user async for user in db.users.find({"id": {"$in": user_ids}}, projection)}
+
+def project_document(doc: dict, projection: dict) -> dict:
+    # Top-level Mongo projection applied in memory
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if any(fields.values()):
+        return {k: v for k, v in doc.items() if fields.get(k)}
+    return {k: v for k, v in doc.items() if k not in fields and k != "_id"}
+
+async def hydrate_assignees(tasks: List[dict], projection: Optional[dict] = None) -> List[dict]:
+    users = await load_users((uid for task in tasks for uid in task.get("assigned_to") or []), projection)
+    for task in tasks:
+        task["assignees"] = [users[uid] for uid in task.get("assigned_to") or [] if uid in users]
+    return tasks
+
+def encode_cursor(*values) -> str:
+    # Opaque keyset cursor: the sort key values of the last item on a page
+    return base64.urlsafe_b64encode(json.dumps(values).encode('utf-8')).decode('ascii')
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Cursor invalid")
+    return values
+
+def keyset_condition(field: str, descending: bool, value, last_id: str) -> dict:
+    # Everything strictly after (value, last_id) in (field, id) order
+    op = "$lt" if descending else "$gt"
+    return {"$or": [{field: {op: value}}, {field: value, "id": {op: last_id}}]}
+
+def parse_fields(fields: Optional[str], allowed: set, nested: Optional[dict] = None,
+                 restricted: frozenset = frozenset()) -> Optional[dict]:
+    # Sparse fieldsets: ?fields=id,title,assignees.name
+    # Returns None when no selection was made, otherwise {field: None} for
+    # whole fields and {field: {sub, ...}} for parts of a hydrated sub-object.
+    # `nested` maps hydrated fields to their allowed sub-fields; anything in
+    # `restricted` is hidden from the caller's role.
+    if not fields:
+        return None
+    nested = nested or {}
+    selection, unknown, denied = {}, set(), set()
+    for item in (f.strip() for f in fields.split(",")):
+        if not item:
+            continue
+        name, _, sub = item.partition(".")
+        if item in restricted or name in restricted:
+            denied.add(item)
+        elif sub and sub in nested.get(name, ()):
+            if selection.get(name, set()) is not None:
+                selection.setdefault(name, set()).add(sub)
+        elif not sub and (name in allowed or name in nested):
+            selection[name] = None
+        else:
+            unknown.add(item)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Câmpuri necunoscute: {', '.join(sorted(unknown))}")
+    if denied:
+        raise HTTPException(status_code=403, detail=f"Acces interzis la câmpurile: {', '.join(sorted(denied))}")
+    # Only separators or blanks (?fields=,) select nothing: same as no fieldset
+    return selection or None
+
+def fields_projection(selection: Optional[dict], sources: Optional[dict] = None, always=("id",)) -> dict:
+    # Mongo projection for a selection; hydrated fields pull in the stored
+    # fields they are built from (`sources`), `always` covers sort/cursor keys
+    if selection is None:
+        return {"_id": 0}
+    sources = sources or {}
+    stored = set(always)
+    for name in selection:
+        stored.update(sources.get(name, (name,)))
+    return {"_id": 0, **{f: 1 for f in stored}}
+
+def wants(selection: Optional[dict], name: str) -> bool:
+    return selection is None or name in selection
+
+def select_fields(docs: List[dict], selection: Optional[dict]) -> List[dict]:
+    if selection is None:
+        return docs
+    
+    def trim(value, subs):
+        if subs is None:
+            return value
+        if isinstance(value, list):
+            return [trim(v, subs) for v in value]
+        if isinstance(value, dict):
+            return {k: v for k, v in value.items() if k in subs}
+        return value
+    
+    return [{k: trim(doc[k], selection[k]) for k in selection if k in doc} for doc in docs]
+
+# Selectable fields follow the response models, which also list the fields
+# only stored documents carry (updated_at)
+USER_FIELDS = set(UserOut.model_fields)
+# Ownership shares are only shown to admins
+ADMIN_ONLY_USER_FIELDS = frozenset({"company_share"})
+
+def user_projection(current_user: dict, subs: Optional[set] = None) -> dict:
+    # Projection for users hydrated into another resource (assignees, report author)
+    if subs is not None:
+        return {"_id": 0, "id": 1, **{f: 1 for f in subs}}
+    projection = {"_id": 0, "password_hash": 0}
+    if current_user["role"] != "admin":
+        projection.update({f: 0 for f in ADMIN_ONLY_USER_FIELDS})
+    return projection
+
+def user_restrictions(current_user: dict, *prefixes: str) -> frozenset:
+    if current_user["role"] == "admin":
+        return frozenset()
+    return frozenset(f"{p}.{f}" if p else f for p in prefixes for f in ADMIN_ONLY_USER_FIELDS)
+
+def apply_text_delta(content: str, ops: List[ReportDeltaOp]) -> str:
+    # Ops are applied in order, each one against the result of the previous
+    for op in ops:
+        if op.pos < 0 or op.delete < 0 or op.pos + op.delete > len(content):
+            raise ValueError("delta out of range")
+        content = content[:op.pos] + op.insert + content[op.pos + op.delete:]
+    return content
+
+def trusted_json(content, response: Optional[Response] = None) -> ORJSONResponse:
+    # Returning a Response bypasses response_model validation and
+    # serialization; only for documents the route built from Mongo itself.
+    # Headers already set on the injected `response` are carried over.
+    trusted = ORJSONResponse(content)
+    if response is not None:
+        for key, value in response.headers.items():
+            if key != "content-length":
+                trusted.headers[key] = value
+    return trusted
+
+def etag_matches(request: Request, etag: str) -> bool:
+    candidates = {tag.strip() for tag in request.headers.get("if-none-match", "").split(",")}
+    return etag in candidates or "*" in candidates
+
+# ============== CACHING ==============
+
+class TTLCache:
+    # In-process cache with a fixed TTL and per-key single-flight: concurrent
+    # misses for the same key wait on one shared computation
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entries = {}  # key -> (expires_at, value)
+        self._inflight = {}  # key -> asyncio.Task
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    async def get_or_compute(self, key, compute):
+        entry = self._entries.get(key)
+        if entry and entry[0] > time.monotonic():
+            self.hits += 1
+            return entry[1]
+        task = self._inflight.get(key)
+        if task is None:
+            self.misses += 1
+            task = asyncio.ensure_future(self._fill(key, compute, self._generation))
+            self._inflight[key] = task
+        else:
+            self.hits += 1
+        # Shielded so a disconnecting caller doesn't cancel the shared computation
+        return await asyncio.shield(task)
+
+    async def _fill(self, key, compute, generation: int):
+        try:
+            value = await compute()
+            # Don't store a result computed from data an invalidation already replaced
+            if generation == self._generation:
+                self._entries[key] = (time.monotonic() + self.ttl, value)
+            return value
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    def clear(self):
+        self._generation += 1
+        self._entries.clear()
+        self._inflight.clear()
+
+dashboard_cache = TTLCache(DASHBOARD_CACHE_SECONDS)
+
+# ============== STATS COUNTERS ==============
+#
+# Dashboard totals live in one `stats` document kept current with atomic $inc
+# from the write routes:
+#   tasks:   total, by_status.<status>, by_assignee.<user_id>.{total, by_status.<status>}
+#   clients: total, active, total_budget, monthly_revenue, by_type.<type>.{count, budget}
+#   users:   employees
+# Each entity type maps a document to the counters it contributes; a write
+# applies contribution(after) - contribution(before).
+
+STATS_ID = "dashboard"
+
+def counter_key(value) -> str:
+    # User-supplied values become field names, so keep them free of path separators
+    key = str(value) if value not in (None, "") else "_"
+    return key.replace(".", "\uff0e").replace("$", "\uff04")
+
+def counter_value(key: str) -> str:
+    return key.replace("\uff0e", ".").replace("\uff04", "$")
+
+def task_counters(task: Optional[dict]) -> dict:
+    if not task:
+        return {}
+    status = counter_key(task.get("status"))
+    counters = {"tasks.total": 1, f"tasks.by_status.{status}": 1}
+    for user_id in set(task.get("assigned_to") or []):
+        prefix = f"tasks.by_assignee.{counter_key(user_id)}"
+        counters[f"{prefix}.total"] = 1
+        counters[f"{prefix}.by_status.{status}"] = 1
+    return counters
+
+def client_counters(client: Optional[dict]) -> dict:
+    if not client:
+        return {}
+    active = client.get("status") == "activ"
+    budget = client.get("budget") or 0
+    project_type = counter_key(client.get("project_type") or "Altele")
+    return {
+        "clients.total": 1,
+        "clients.active": 1 if active else 0,
+        "clients.total_budget": budget,
+        "clients.monthly_revenue": (client.get("monthly_fee") or 0) if active else 0,
+        f"clients.by_type.{project_type}.count": 1,
+        f"clients.by_type.{project_type}.budget": budget
+    }
+
+def user_counters(user: Optional[dict]) -> dict:
+    if not user:
+        return {}
+    return {"users.employees": 1 if user.get("role") == "employee" else 0}
+
+TASK_COUNTER_FIELDS = {"_id": 0, "status": 1, "assigned_to": 1}
+CLIENT_COUNTER_FIELDS = {"_id": 0, "status": 1, "budget": 1, "monthly_fee": 1, "project_type": 1}
+USER_COUNTER_FIELDS = {"_id": 0, "role": 1}
+
+ENTITY_COUNTERS = {"task": task_counters, "client": client_counters, "user": user_counters}
+
+async def bump_stats(before: Optional[dict], after: Optional[dict], counters):
+    delta = counters(after)
+    for key, value in counters(before).items():
+        delta[key] = delta.get(key, 0) - value
+    delta = {key: value for key, value in delta.items() if value}
+    if delta:
+        await db.stats.update_one({"_id": STATS_ID}, {"$inc": delta}, upsert=True)
+
+def flatten_counters(doc: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in doc.items():
+        if isinstance(value, dict):
+            flat.update(flatten_counters(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+    return flat
+
+def nest_counters(flat: dict) -> dict:
+    doc = {}
+    for path, value in flat.items():
+        *parents, leaf = path.split(".")
+        node = doc
+        for part in parents:
+            node = node.setdefault(part, {})
+        node[leaf] = value
+    return doc
+
+async def rebuild_stats() -> dict:
+    # Recount everything from the raw collections and correct every counter
+    # that had drifted with a relative $inc, so writes landing meanwhile keep
+    # their own $inc. Returns the corrected counters
+    snapshot = flatten_counters(await db.stats.find_one({"_id": STATS_ID}, {"_id": 0}) or {})
+    fresh = {}
+    
+    def add(counters: dict):
+        for key, value in counters.items():
+            fresh[key] = fresh.get(key, 0) + value
+    
+    async for task in db.tasks.find({}, TASK_COUNTER_FIELDS):
+        add(task_counters(task))
+    async for client_doc in db.clients.find({}, CLIENT_COUNTER_FIELDS):
+        add(client_counters(client_doc))
+    async for user in db.users.find({"role": "employee"}, USER_COUNTER_FIELDS):
+        add(user_counters(user))
+    
+    current = flatten_counters(await db.stats.find_one({"_id": STATS_ID}, {"_id": 0}) or {})
+    drift = {}
+    for key in set(fresh) | set(current):
+        expected, actual = fresh.get(key, 0), current.get(key, 0)
+        # A counter that moved during the recount may or may not include that
+        # write in `fresh`; leave it to the next run
+        if snapshot.get(key, 0) != actual:
+            continue
+        if abs(expected - actual) > 1e-6:
+            drift[key] = {"expected": expected, "actual": actual}
+    if not drift:
+        return drift
+    
+    # Applied only if the drifted counters are still what we compared
+    # against: a worker reconciling at the same time (every worker does at
+    # startup) has then already corrected them
+    guard = {key: {"$in": [0, None]} if values["actual"] == 0 else values["actual"]
+             for key, values in drift.items()}
+    correction = {key: values["expected"] - values["actual"] for key, values in drift.items()}
+    try:
+        result = await db.stats.update_one({"_id": STATS_ID, **guard}, {"$inc": correction}, upsert=True)
+    except DuplicateKeyError:
+        result = None
+    if result is None or (result.matched_count == 0 and result.upserted_id is None):
+        logger.info("Stats counters changed during reconciliation; retrying on the next run")
+        return {}
+    
+    logger.warning("Stats counters drifted on %d keys: %s", len(drift), drift)
+    dashboard_cache.clear()
+    await touch_revision("stats")
+    return drift
+
+async def reconcile_stats_periodically():
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_SECONDS)
+        try:
+            await rebuild_stats()
+        except Exception:
+            logger.exception("Stats reconciliation failed")
+
+# ============== WRITE HOOKS ==============
+#
+# Write routes report every create/update/delete here with the document's
+# state before and after (None for a create or delete); each derived
+# structure is kept in step from this one place.
+
+# Fields a write route reads back from the pre-image: everything the derived structures use
+TASK_PREIMAGE_FIELDS = {
+    **TASK_COUNTER_FIELDS, "id": 1, "title": 1, "start_date": 1, "due_date": 1, "created_at": 1,
+    "priority": 1, "started_at": 1, "status_changed_at": 1
+}
+CLIENT_PREIMAGE_FIELDS = {**CLIENT_COUNTER_FIELDS, "id": 1, "company_name": 1}
+USER_PREIMAGE_FIELDS = {**USER_COUNTER_FIELDS, "id": 1, "name": 1, "email": 1}
+
+async def on_entity_write(kind: str, before: Optional[dict], after: Optional[dict]):
+    # Shared state (Mongo counters) is moved once, by the worker that made the
+    # write; every worker's in-memory state follows via the invalidation bus
+    counters = ENTITY_COUNTERS.get(kind)
+    if counters:
+        await bump_stats(before, after, counters)
+    await record_tombstones(kind, before, after)
+    apply_entity_change(kind, before, after)
+    # Bumped only once caches are dropped, so a new ETag never labels stale data
+    revision = await revisions.bump(kind)
+    await invalidation_bus.publish(kind, before, after, revision)
+
+async def touch_revision(kind: str):
+    # Data readers see changed without an entity write behind it
+    revision = await revisions.bump(kind)
+    await invalidation_bus.publish(kind, None, None, revision)
+
+# One list per running rebuild_memory_indexes: changes applied while it reads
+# Mongo, replayed onto the new indexes before they replace the old ones
+index_change_buffers = []
+
+def apply_index_change(indexes: tuple, kind: str, before: Optional[dict], after: Optional[dict]):
+    autocomplete, client_names, workload = indexes
+    autocomplete.apply(kind, before, after)
+    if kind == "client":
+        client_names.apply(before, after)
+    if kind == "task":
+        workload.apply(before, after)
+
+def apply_entity_change(kind: str, before: Optional[dict], after: Optional[dict]):
+    if kind == "stats":
+        # The counters were recounted
+        dashboard_cache.clear()
+        return
+    apply_index_change((autocomplete_index, client_name_index, workload_index), kind, before, after)
+    for changes in index_change_buffers:
+        changes.append((kind, before, after))
+    if kind == "task":
+        reminder_scheduler.apply(before, after)
+    if kind in ("task", "client", "user"):
+        dashboard_cache.clear()
+    publish_entity_event(kind, before, after)
+
+# ============== LIVE EVENTS ==============
+#
+# on_entity_write publishes every change to an in-process bus; each open
+# GET /api/events stream (server-sent events) is a subscriber with a bounded
+# queue. Events carry only the changed fields so clients can patch their
+# lists instead of refetching them:
+#   {"type": "task", "op": "created" | "updated" | "deleted", "id", "data", "at"}
+# A "dashboard" event tells the listener that its stats changed. A subscriber
+# that falls EVENT_QUEUE_SIZE events behind has its backlog replaced by one
+# "resync" event (refetch everything), so a slow client never blocks a write.
+#
+# EventSource can't send headers, so browsers first trade their session token
+# for a short-lived ticket (POST /api/events/ticket) and put that in the URL
+# instead of the token. A stream ends with a "closed" event when the session
+# expires or the user is deleted or changes role; the client then asks for a
+# new ticket.
+
+EVENT_QUEUE_SIZE = 256
+EVENT_KEEPALIVE_SECONDS = 20
+# Never pushed, whoever is listening
+EVENT_HIDDEN_FIELDS = {"_id", "password_hash", "file_data", "priority_rank", "due_sort"}
+
+class Subscription:
+    def __init__(self, user: dict, expires_at: float):
+        self.user_id = user["user_id"]
+        self.is_admin = user["role"] == "admin"
+        self.expires_at = expires_at  # epoch seconds: end of the session
+        self.queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+        self.dropped = 0
+        self.closed = False
+
+class EventBus:
+    def __init__(self):
+        self._subscribers = set()
+
+    def __len__(self):
+        return len(self._subscribers)
+
+    def subscribe(self, user: dict, expires_at: float) -> Subscription:
+        subscription = Subscription(user, expires_at)
+        self._subscribers.add(subscription)
+        return subscription
+
+    def disconnect(self, user_id: str):
+        # Ends that user's open streams; the wake-up event only needs to get
+        # the stream loop to look at `closed`
+        for sub in self._subscribers:
+            if sub.user_id == user_id:
+                sub.closed = True
+                try:
+                    sub.queue.put_nowait({"type": "closed"})
+                except asyncio.QueueFull:
+                    pass
+
+    def unsubscribe(self, subscription: Subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, event: dict, admins: bool = True, user_ids=()):
+        # Delivered to admins (if `admins`) and to the listed users
+        for sub in self._subscribers:
+            if not ((admins and sub.is_admin) or sub.user_id in user_ids):
+                continue
+            try:
+                sub.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                sub.dropped += sub.queue.qsize()
+                while not sub.queue.empty():
+                    sub.queue.get_nowait()
+                sub.queue.put_nowait({"type": "resync", "at": event.get("at")})
+
+event_bus = EventBus()
+
+class Everyone:
+    def __contains__(self, user_id):
+        return True
+
+def entity_event(kind: str, op: str, entity_id: str, data: Optional[dict] = None) -> dict:
+    return {
+        "type": kind,
+        "op": op,
+        "id": entity_id,
+        "data": {k: v for k, v in (data or {}).items() if k not in EVENT_HIDDEN_FIELDS},
+        "at": datetime.now(timezone.utc).isoformat()
+    }
+
+def publish_entity_event(kind: str, before: Optional[dict], after: Optional[dict]):
+    if not event_bus:
+        return
+    entity_id = (after or before or {}).get("id")
+    if after is None:
+        op, data = "deleted", None
+    elif before is None:
+        op, data = "created", after
+    else:
+        op, data = "updated", {k: v for k, v in after.items() if before.get(k) != v}
+    event = entity_event(kind, op, entity_id, data)
+    
+    if kind == "task":
+        # Assignees see their tasks; someone taken off a task sees it disappear
+        was = set((before or {}).get("assigned_to") or [])
+        now = set((after or {}).get("assigned_to") or [])
+        event_bus.publish(event, user_ids=now if after is not None else was)
+        if after is not None and was - now:
+            event_bus.publish(entity_event(kind, "deleted", entity_id), admins=False, user_ids=was - now)
+        event_bus.publish({"type": "dashboard", "at": event["at"]}, user_ids=was | now)
+    elif kind == "note":
+        event_bus.publish(event, user_ids=Everyone())
+    elif kind == "report":
+        event_bus.publish(event, user_ids={(after or before).get("user_id")})
+    elif kind == "notification":
+        event_bus.publish(event, admins=False, user_ids={(after or before).get("user_id")})
+    else:
+        event_bus.publish(event)
+        if kind in ("client", "user"):
+            event_bus.publish({"type": "dashboard", "at": event["at"]})
+    if kind == "user" and before and (after is None or after.get("role", before.get("role")) != before.get("role")):
+        # Streams were opened with the old role
+        event_bus.disconnect(before.get("id"))
+
+@api_router.post("/events/ticket", response_model=dict)
+async def create_event_ticket(current_user: dict = Depends(get_current_user)):
+    # The role comes from the stored user, so a deleted or demoted account
+    # can't open a stream with what its token still claims
+    user = await db.users.find_one({"id": current_user["user_id"]}, {"_id": 0, "role": 1})
+    if not user:
+        raise HTTPException(status_code=401, detail="Token invalid")
+    payload = {
+        "user_id": current_user["user_id"],
+        "role": user["role"],
+        "purpose": "events",
+        "session_exp": current_user["exp"],
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=EVENT_TICKET_SECONDS)
+    }
+    return {"ticket": jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM), "expires_in": EVENT_TICKET_SECONDS}
+
+@api_router.get("/events")
+async def stream_events(
+    request: Request,
+    ticket: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)
+):
+    # Browsers pass a ticket; other clients can send the session token as a header
+    if ticket:
+        current_user = decode_token(ticket, "events")
+        expires_at = current_user["session_exp"]
+    else:
+        current_user = decode_token(credentials.credentials if credentials else None)
+        expires_at = current_user["exp"]
+    subscription = event_bus.subscribe(current_user, expires_at)
+    
+    async def stream():
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                remaining = subscription.expires_at - time.time()
+                if remaining <= 0 or subscription.closed:
+                    yield f"event: closed\ndata: {json.dumps({'type': 'closed'})}\n\n"
+                    break
+                try:
+                    event = await asyncio.wait_for(
+                        subscription.queue.get(), min(EVENT_KEEPALIVE_SECONDS, remaining)
+                    )
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    if time.time() < subscription.expires_at:
+                        yield ": keepalive\n\n"
+                    continue
+                if event["type"] == "closed":
+                    continue
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# ============== INVALIDATION BUS ==============
+#
+# With several uvicorn workers each process holds its own indexes, caches and
+# SSE listeners. on_entity_write appends every change to the capped
+# `invalidations` collection; each worker tails it with a tailable/awaitData
+# cursor and replays the other workers' changes through apply_entity_change.
+# Needs nothing beyond MongoDB (no replica set).
+#
+# ObjectIds are minted by each worker, so across workers they don't follow
+# insertion order: a reopened cursor reads the log in $natural (insertion)
+# order and skips up to the last message seen instead of filtering on _id.
+
+WORKER_ID = str(uuid.uuid4())
+INVALIDATION_LOG_BYTES = 16 * 1024 * 1024
+INVALIDATION_RETRY_SECONDS = 1.0
+
+def bus_document(doc: Optional[dict]) -> Optional[dict]:
+    if doc is None:
+        return None
+    return {k: v for k, v in doc.items() if k not in EVENT_HIDDEN_FIELDS}
+
+class InvalidationBus:
+    def __init__(self):
+        self._last_id = None
+        self._task = None
+        self.received = 0
+        self.last_lag = None  # seconds between publish and replay of the last message
+
+    async def prepare(self):
+        # Called before the in-memory state is built: whatever is published
+        # from here on is replayed on top of it, so nothing falls in between
+        try:
+            await db.create_collection("invalidations", capped=True, size=INVALIDATION_LOG_BYTES)
+        except CollectionInvalid:
+            pass
+        last = await db.invalidations.find_one({}, {"_id": 1}, sort=[("$natural", -1)])
+        self._last_id = last["_id"] if last else None
+
+    async def publish(self, kind: str, before: Optional[dict], after: Optional[dict],
+                      revision: Optional[int] = None):
+        try:
+            await db.invalidations.insert_one({
+                "origin": WORKER_ID,
+                "kind": kind,
+                "before": bus_document(before),
+                "after": bus_document(after),
+                "revision": revision,
+                "at": time.time()
+            })
+        except Exception:
+            # The write itself succeeded and its revision is in Mongo, which
+            # other workers re-read before answering 304 (revision_guard)
+            logger.exception("Could not publish %s change to the invalidation bus", kind)
+
+    def receive(self, message: dict):
+        self._last_id = message["_id"]
+        if message.get("origin") == WORKER_ID:
+            return
+        self.received += 1
+        self.last_lag = time.time() - message.get("at", time.time())
+        kind, before, after = message["kind"], message.get("before"), message.get("after")
+        if before is not None or after is not None or kind == "stats":
+            apply_entity_change(kind, before, after)
+        revisions.observe(kind, message.get("revision"))
+
+    async def _run(self):
+        while True:
+            resume_after = self._last_id
+            cursor = db.invalidations.find({}, cursor_type=CursorType.TAILABLE_AWAIT)
+            try:
+                # A tailable cursor on an empty log dies at once; it is reopened below
+                while cursor.alive:
+                    async for message in cursor:
+                        if resume_after is not None:
+                            if message["_id"] == resume_after:
+                                resume_after = None
+                            continue
+                        try:
+                            self.receive(message)
+                        except Exception:
+                            logger.exception("Could not apply invalidation %s", message.get("_id"))
+                    if resume_after is not None:
+                        # Caught up without meeting the last message: the
+                        # capped log wrapped past it and changes were lost
+                        resume_after = None
+                        await self.resynchronize()
+            except Exception:
+                logger.exception("Invalidation bus cursor failed")
+            await asyncio.sleep(INVALIDATION_RETRY_SECONDS)
+
+    async def resynchronize(self):
+        logger.error("Invalidation log wrapped past this worker; rebuilding in-memory state")
+        await revisions.load()
+        dashboard_cache.clear()
+        await rebuild_memory_indexes()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+invalidation_bus = InvalidationBus()
+
+# ============== REVISIONS ==============
+#
+# One counter per entity kind in the stats collection, bumped after every
+# write and carried to the other workers on the invalidation bus. List
+# endpoints derive a weak ETag from the revisions they depend on, so a
+# matching If-None-Match is answered before any query runs. The bus is only
+# the fast path: a 304 is never answered from counters older than
+# REVISION_REFRESH_SECONDS without re-reading them from Mongo first.
+
+REVISIONS_ID = "revisions"
+
+class RevisionCounters:
+    def __init__(self):
+        self._values = {}  # kind -> (revision, changed at)
+        self.refreshed_at = 0.0  # monotonic time of the last read from Mongo
+        # Changes if a bump could not be recorded: every ETag this worker
+        # handed out so far stops matching
+        self.epoch = WORKER_ID
+
+    async def load(self):
+        await self.refresh()
+        self.epoch = "shared"
+
+    async def refresh(self):
+        doc = await db.stats.find_one({"_id": REVISIONS_ID}) or {}
+        for kind, value in doc.items():
+            if kind != "_id":
+                self.observe(kind, value)
+        self.refreshed_at = time.monotonic()
+
+    async def bump(self, kind: str) -> Optional[dict]:
+        try:
+            doc = await db.stats.find_one_and_update(
+                {"_id": REVISIONS_ID},
+                {"$inc": {f"{kind}.rev": 1}, "$max": {f"{kind}.at": time.time()}},
+                projection={kind: 1},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception:
+            logger.exception("Could not bump the %s revision", kind)
+            self.epoch = str(uuid.uuid4())
+            return None
+        self.observe(kind, doc[kind])
+        return doc[kind]
+
+    def observe(self, kind: str, value: Optional[dict]):
+        if not value:
+            return
+        current = self._values.get(kind)
+        if current is None or value["rev"] > current[0]:
+            self._values[kind] = (value["rev"], value.get("at") or 0)
+
+    def get(self, kind: str) -> tuple:
+        return self._values.get(kind, (0, 0))
+
+revisions = RevisionCounters()
+
+def revision_validators(request: Request, current_user: dict, kinds) -> tuple:
+    # The ETag covers the route, its query string and the caller, who may see
+    # a different body
+    values = [revisions.get(kind) for kind in kinds]
+    key = "|".join([
+        revisions.epoch, request.url.path, request.url.query, current_user["role"], current_user["user_id"],
+        *(f"{kind}:{rev}" for kind, (rev, _) in zip(kinds, values))
+    ])
+    etag = f'W/"{hashlib.sha1(key.encode("utf-8")).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache", "Vary": "Authorization"}
+    changed_at = max((at for _, at in values), default=0)
+    if changed_at:
+        headers["Last-Modified"] = format_datetime(datetime.fromtimestamp(changed_at, timezone.utc), usegmt=True)
+    return etag, changed_at, headers
+
+def client_is_current(request: Request, etag: str, changed_at: float) -> bool:
+    if "if-none-match" in request.headers:
+        return etag_matches(request, etag)
+    if changed_at and "if-modified-since" in request.headers:
+        # Whole seconds on the wire: only a change in an earlier second than
+        # the client's copy is safely older than it
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"]).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(changed_at) < since
+    return False
+
+async def revision_guard(request: Request, response: Response, current_user: dict, *kinds: str) -> Optional[Response]:
+    # Returns a 304 when the caller's copy is current, otherwise sets the
+    # validators on `response` for the body about to be built
+    etag, changed_at, headers = revision_validators(request, current_user, kinds)
+    current = client_is_current(request, etag, changed_at)
+    if current and time.monotonic() - revisions.refreshed_at > REVISION_REFRESH_SECONDS:
+        # Only this worker's counters vouch for the copy; a change whose bus
+        # message was lost is visible in Mongo alone
+        try:
+            await revisions.refresh()
+        except Exception:
+            logger.exception("Could not refresh revisions")
+            current = False
+        else:
+            etag, changed_at, headers = revision_validators(request, current_user, kinds)
+            current = client_is_current(request, etag, changed_at)
+    if current:
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
 # ============== AUTH ROUTES ==============
 
 @api_router.post("/auth/login", response_model=LoginResponse)
@@ -238,7 +1287,7 @@ async def login(request: LoginRequest):
     if not user:
         raise HTTPException(status_code=401, detail="Email sau parolă incorectă")
     
-    if not verify_password(request.password, user["password_hash"]):
+    if not await verify_password(request.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Email sau parolă incorectă")
     
     token = create_token(user["id"], user["email"], user["role"])
@@ -268,15 +1317,20 @@ async def register_admin(request: UserCreate):
     )
     
     doc = user.model_dump()
-    doc["password_hash"] = hash_password(request.password)
+    doc["password_hash"] = await hash_password(request.password)
     doc["created_at"] = doc["created_at"].isoformat()
+    doc["updated_at"] = doc["created_at"]
     
     await db.users.insert_one(doc)
+    await on_entity_write("user", None, doc)
     
     return {"message": "Admin creat cu succes", "user_id": user.id}
 
 @api_router.get("/auth/me", response_model=dict)
-async def get_me(current_user: dict = Depends(get_current_user)):
+async def get_me(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
+    not_modified = await revision_guard(request, response, current_user, "user")
+    if not_modified:
+        return not_modified
     user = await db.users.find_one({"id": current_user["user_id"]}, {"_id": 0, "password_hash": 0})
     if not user:
         raise HTTPException(status_code=404, detail="Utilizator negăsit")
@@ -284,10 +1338,16 @@ async def get_me(current_user: dict = Depends(get_current_user)):
 
 # ============== USER/EMPLOYEE ROUTES ==============
 
-@api_router.get("/users", response_model=List[dict])
-async def get_users(current_user: dict = Depends(require_admin)):
-    users = await db.users.find({}, {"_id": 0, "password_hash": 0}).to_list(1000)
-    return users
+@api_router.get("/users", response_model=List[UserOut])
+async def get_users(request: Request, response: Response, fields: Optional[str] = None,
+                    current_user: dict = Depends(require_admin)):
+    not_modified = await revision_guard(request, response, current_user, "user")
+    if not_modified:
+        return not_modified
+    selection = parse_fields(fields, USER_FIELDS)
+    projection = fields_projection(selection) if selection is not None else {"_id": 0, "password_hash": 0}
+    users = await db.users.find({}, projection).to_list(1000)
+    return trusted_json(select_fields(users, selection), response)
 
 @api_router.get("/users/{user_id}", response_model=dict)
 async def get_user(user_id: str, current_user: dict = Depends(require_admin)):
@@ -312,10 +1372,12 @@ async def create_user(request: UserCreate, current_user: dict = Depends(require_
     )
     
     doc = user.model_dump()
-    doc["password_hash"] = hash_password(request.password)
+    doc["password_hash"] = await hash_password(request.password)
     doc["created_at"] = doc["created_at"].isoformat()
+    doc["updated_at"] = doc["created_at"]
     
     await db.users.insert_one(doc)
+    await on_entity_write("user", None, doc)
     
     return {"message": "Utilizator creat cu succes", "user_id": user.id}
 
@@ -336,10 +1398,15 @@ async def update_user(user_id: str, request: UserUpdate, current_user: dict = De
         del update_data["role"]
     
     if "password" in update_data:
-        update_data["password_hash"] = hash_password(update_data.pop("password"))
+        update_data["password_hash"] = await hash_password(update_data.pop("password"))
     
     if update_data:
-        await db.users.update_one({"id": user_id}, {"$set": update_data})
+        update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        before = await db.users.find_one_and_update(
+            {"id": user_id}, {"$set": update_data}, projection=USER_PREIMAGE_FIELDS
+        )
+        if before:
+            await on_entity_write("user", before, {**before, **update_data})
     
     return {"message": "Utilizator actualizat cu succes"}
 
@@ -349,37 +1416,137 @@ async def delete_user(user_id: str, current_user: dict = Depends(require_admin))
     if user_id == current_user["user_id"]:
         raise HTTPException(status_code=400, detail="Nu vă puteți șterge propriul cont")
     
-    result = await db.users.delete_one({"id": user_id})
-    if result.deleted_count == 0:
+    user = await db.users.find_one_and_delete({"id": user_id}, projection=USER_PREIMAGE_FIELDS)
+    if not user:
         raise HTTPException(status_code=404, detail="Utilizator negăsit")
+    await on_entity_write("user", user, None)
     
     return {"message": "Utilizator șters cu succes"}
 
 # ============== TASK ROUTES ==============
 
-@api_router.get("/tasks", response_model=List[dict])
-async def get_tasks(current_user: dict = Depends(get_current_user)):
+TASK_FIELDS = set(TaskOut.model_fields) - {"assignees"}
+
+@api_router.get("/tasks", response_model=List[TaskOut])
+async def get_tasks(request: Request, response: Response, fields: Optional[str] = None,
+                    current_user: dict = Depends(get_current_user)):
+    not_modified = await revision_guard(request, response, current_user, "task", "user")
+    if not_modified:
+        return not_modified
+    selection = parse_fields(fields, TASK_FIELDS, {"assignees": USER_FIELDS},
+                             restricted=user_restrictions(current_user, "assignees"))
+    projection = fields_projection(selection, {"assignees": ("assigned_to",)}) if selection else TASK_PROJECTION
     if current_user["role"] == "admin":
-        tasks = await db.tasks.find({}, {"_id": 0}).to_list(1000)
+        tasks = await db.tasks.find({}, projection).to_list(1000)
     else:
         # Employee sees tasks where they are in assigned_to list
-        tasks = await db.tasks.find({"assigned_to": current_user["user_id"]}, {"_id": 0}).to_list(1000)
+        tasks = await db.tasks.find({"assigned_to": current_user["user_id"]}, projection).to_list(1000)
     
     # Add assignees info
-    for task in tasks:
-        assignees = []
-        if task.get("assigned_to"):
-            for user_id in task["assigned_to"]:
-                assignee = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
-                if assignee:
-                    assignees.append(assignee)
-        task["assignees"] = assignees
-    
-    return tasks
+    if wants(selection, "assignees"):
+        subs = selection["assignees"] if selection else None
+        await hydrate_assignees(tasks, user_projection(current_user, subs))
+    
+    return trusted_json(select_fields(tasks, selection), response)
+
+BOARD_STATUSES = ("pending", "in_progress", "completed")
+PRIORITY_ORDER = ("high", "medium", "low")
+# Tasks without a deadline go to the bottom of their column
+NO_DUE_DATE = "9999-12-31"
+
+# Board order is stored on each task so a column is an index walk on
+# (status, priority_rank, due_sort, id); the API never returns these fields
+BOARD_SORT_FIELDS = ("priority_rank", "due_sort")
+TASK_PROJECTION = {"_id": 0, **{field: 0 for field in BOARD_SORT_FIELDS}}
+
+def board_sort_fields(task: dict) -> dict:
+    priority = task.get("priority")
+    return {
+        "priority_rank": PRIORITY_ORDER.index(priority) if priority in PRIORITY_ORDER else len(PRIORITY_ORDER),
+        "due_sort": NO_DUE_DATE if task.get("due_date") is None else task["due_date"]
+    }
+
+def board_sort_stage() -> dict:
+    # board_sort_fields as an update pipeline stage, for tasks stored before it
+    return {"$set": {
+        "priority_rank": {"$switch": {
+            "branches": [{"case": {"$eq": ["$priority", p]}, "then": i} for i, p in enumerate(PRIORITY_ORDER)],
+            "default": len(PRIORITY_ORDER)
+        }},
+        "due_sort": {"$ifNull": ["$due_date", NO_DUE_DATE]}
+    }}
+
+async def board_column(query: dict, cursor: Optional[str], limit: int) -> List[dict]:
+    # Highest priority first, then earliest deadline; keyset on (priority_rank, due_sort, id)
+    if cursor:
+        rank, due, last_id = decode_cursor(cursor, 3)
+        query = {"$and": [query, {"$or": [
+            {"priority_rank": {"$gt": rank}},
+            {"priority_rank": rank, "due_sort": {"$gt": due}},
+            {"priority_rank": rank, "due_sort": due, "id": {"$gt": last_id}}
+        ]}]}
+    return await db.tasks.find(query, {"_id": 0}).sort(
+        [("priority_rank", 1), ("due_sort", 1), ("id", 1)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+@api_router.get("/tasks/board", response_model=dict)
+async def get_task_board(
+    status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    # Each column is its own indexed, limited find and the counts one grouped
+    # aggregate, all run concurrently. "Load more" on a column passes that
+    # column's status and next_cursor.
+    if status is not None and status not in BOARD_STATUSES:
+        raise HTTPException(status_code=400, detail="Status invalid")
+    if cursor and status is None:
+        raise HTTPException(status_code=400, detail="Cursorul necesită un status")
+    statuses = [status] if status else list(BOARD_STATUSES)
+    
+    completed_since = (datetime.now(timezone.utc) - timedelta(days=BOARD_COMPLETED_DAYS)).isoformat()
+    
+    def column_query(s: str) -> dict:
+        query = {"status": s}
+        if s == "completed":
+            query["$or"] = [
+                {"completed_at": {"$gte": completed_since}},
+                # Tasks completed before completed_at was recorded
+                {"completed_at": None, "created_at": {"$gte": completed_since}}
+            ]
+        if current_user["role"] != "admin":
+            query["assigned_to"] = current_user["user_id"]
+        return query
+    
+    queries = {s: column_query(s) for s in statuses}
+    heads = await asyncio.gather(
+        *(board_column(query, cursor, limit) for query in queries.values()),
+        db.tasks.aggregate([
+            {"$match": {"$or": list(queries.values())}},
+            {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+        ]).to_list(None)
+    )
+    counts = {c["_id"]: c["count"] for c in heads.pop()}
+    
+    columns = []
+    for s, tasks in zip(statuses, heads):
+        next_cursor = None
+        if len(tasks) > limit:
+            tasks = tasks[:limit]
+            last = tasks[-1]
+            next_cursor = encode_cursor(last["priority_rank"], last["due_sort"], last["id"])
+        for task in tasks:
+            for field in BOARD_SORT_FIELDS:
+                task.pop(field, None)
+        columns.append({"status": s, "count": counts.get(s, 0), "tasks": tasks, "next_cursor": next_cursor})
+    
+    await hydrate_assignees([t for c in columns for t in c["tasks"]], user_projection(current_user))
+    return {"columns": columns, "completed_since": completed_since}
 
 @api_router.get("/tasks/{task_id}", response_model=dict)
 async def get_task(task_id: str, current_user: dict = Depends(get_current_user)):
-    task = await db.tasks.find_one({"id": task_id}, {"_id": 0})
+    task = await db.tasks.find_one({"id": task_id}, TASK_PROJECTION)
     if not task:
         raise HTTPException(status_code=404, detail="Sarcină negăsită")
     
@@ -394,6 +1561,7 @@ async def create_task(request: TaskCreate, current_user: dict = Depends(require_
     task = Task(
         title=request.title,
         description=request.description,
+        start_date=request.start_date,
         due_date=request.due_date,
         priority=request.priority,
         status=request.status,
@@ -403,8 +1571,17 @@ async def create_task(request: TaskCreate, current_user: dict = Depends(require_
     
     doc = task.model_dump()
     doc["created_at"] = doc["created_at"].isoformat()
+    doc["updated_at"] = doc["created_at"]
+    doc["status_changed_at"] = doc["created_at"]
+    if doc["status"] == "in_progress":
+        doc["started_at"] = doc["created_at"]
+    if doc["status"] == "completed":
+        doc["completed_at"] = doc["created_at"]
+    doc.update(board_sort_fields(doc))
     
     await db.tasks.insert_one(doc)
+    await on_entity_write("task", None, doc)
+    await record_status_change(None, doc, doc["created_at"], current_user["user_id"])
     
     return {"message": "Sarcină creată cu succes", "task_id": task.id}
 
@@ -425,38 +1602,98 @@ async def update_task(task_id: str, request: TaskUpdate, current_user: dict = De
     else:
         update_data = {k: v for k, v in request.model_dump().items() if v is not None}
     
+    now = datetime.now(timezone.utc).isoformat()
+    if update_data.get("status", task.get("status")) != task.get("status"):
+        update_data["status_changed_at"] = now
+        if update_data["status"] == "completed":
+            update_data["completed_at"] = now
+        if update_data["status"] == "in_progress" and not task.get("started_at"):
+            update_data["started_at"] = now
+    if "priority" in update_data or "due_date" in update_data:
+        update_data.update(board_sort_fields({**task, **update_data}))
+    
     if update_data:
-        await db.tasks.update_one({"id": task_id}, {"$set": update_data})
+        update_data["updated_at"] = now
+        # The pre-image returned by the update is what the counters must be moved away from
+        before = await db.tasks.find_one_and_update(
+            {"id": task_id}, {"$set": update_data}, projection=TASK_PREIMAGE_FIELDS
+        )
+        if before:
+            after = {**before, **update_data}
+            await on_entity_write("task", before, after)
+            await record_status_change(before, after, now, current_user["user_id"])
     
     return {"message": "Sarcină actualizată cu succes"}
 
 @api_router.delete("/tasks/{task_id}", response_model=dict)
 async def delete_task(task_id: str, current_user: dict = Depends(require_admin)):
-    result = await db.tasks.delete_one({"id": task_id})
-    if result.deleted_count == 0:
+    task = await db.tasks.find_one_and_delete({"id": task_id}, projection=TASK_PREIMAGE_FIELDS)
+    if not task:
         raise HTTPException(status_code=404, detail="Sarcină negăsită")
+    await on_entity_write("task", task, None)
+    await db.task_history.delete_many({"task_id": task_id})
     
     return {"message": "Sarcină ștearsă cu succes"}
 
 # ============== NOTE ROUTES ==============
 
-@api_router.get("/notes", response_model=List[dict])
-async def get_notes(current_user: dict = Depends(get_current_user)):
-    if current_user["role"] == "admin":
-        notes = await db.notes.find({}, {"_id": 0}).to_list(1000)
-    else:
-        # Employees see notes created by them or shared (created_by admin)
-        notes = await db.notes.find({}, {"_id": 0}).to_list(1000)
-    
-    # Add creator name to each note
-    for note in notes:
-        if note.get("created_by"):
-            creator = await db.users.find_one({"id": note["created_by"]}, {"_id": 0, "name": 1})
+NOTE_LIST_FIELDS = {"id", "title", "color", "created_by", "created_at", "preview", "truncated", "creator_name"}
+
+@api_router.get("/notes", response_model=List[NoteListItem])
+async def get_notes(
+    request: Request,
+    response: Response,
+    color: Optional[str] = None,
+    created_by: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    # Notes are shared: admins and employees see the same list.
+    # Newest first, keyset-paginated on (created_at, id); the next page's
+    # cursor is returned in the X-Next-Cursor header.
+    not_modified = await revision_guard(request, response, current_user, "note", "user")
+    if not_modified:
+        return not_modified
+    query = {}
+    if color:
+        query["color"] = color
+    if created_by:
+        query["created_by"] = created_by
+    if cursor:
+        query.update(keyset_condition("created_at", True, *decode_cursor(cursor, 2)))
+    selection = parse_fields(fields, NOTE_LIST_FIELDS)
+    
+    # Only a preview of the content leaves the database; GET /notes/{id} has the full body
+    computed = {
+        "preview": {"$substrCP": ["$content", 0, NOTE_PREVIEW_CHARS]},
+        "truncated": {"$gt": [{"$strLenCP": "$content"}, NOTE_PREVIEW_CHARS]}
+    }
+    projection = fields_projection(
+        selection or dict.fromkeys(NOTE_LIST_FIELDS),
+        {"preview": (), "truncated": (), "creator_name": ("created_by",)},
+        always=("id", "created_at")
+    )
+    projection.update({k: v for k, v in computed.items() if wants(selection, k)})
+    notes = await db.notes.aggregate([
+        {"$match": query},
+        {"$sort": {"created_at": -1, "id": -1}},
+        {"$limit": limit + 1},
+        {"$project": projection}
+    ]).to_list(limit + 1)
+    
+    if len(notes) > limit:
+        notes = notes[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(notes[-1]["created_at"], notes[-1]["id"])
+    
+    if wants(selection, "creator_name"):
+        creators = await load_users((note.get("created_by") for note in notes), {"_id": 0, "name": 1})
+        for note in notes:
+            creator = creators.get(note.get("created_by"))
             note["creator_name"] = creator["name"] if creator else "Necunoscut"
-        else:
-            note["creator_name"] = "Necunoscut"
     
-    return notes
+    return trusted_json(select_fields(notes, selection), response)
 
 @api_router.get("/notes/{note_id}", response_model=dict)
 async def get_note(note_id: str, current_user: dict = Depends(get_current_user)):
@@ -476,8 +1713,10 @@ async def create_note(request: NoteCreate, current_user: dict = Depends(get_curr
     
     doc = note.model_dump()
     doc["created_at"] = doc["created_at"].isoformat()
+    doc["updated_at"] = doc["created_at"]
     
     await db.notes.insert_one(doc)
+    await on_entity_write("note", None, doc)
     
     return {"message": "Notiță creată cu succes", "note_id": note.id}
 
@@ -494,7 +1733,9 @@ async def update_note(note_id: str, request: NoteUpdate, current_user: dict = De
     update_data = {k: v for k, v in request.model_dump().items() if v is not None}
     
     if update_data:
+        update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
         await db.notes.update_one({"id": note_id}, {"$set": update_data})
+        await on_entity_write("note", note, {**note, **update_data})
     
     return {"message": "Notiță actualizată cu succes"}
 
@@ -509,15 +1750,155 @@ async def delete_note(note_id: str, current_user: dict = Depends(get_current_use
         raise HTTPException(status_code=403, detail="Acces interzis")
     
     await db.notes.delete_one({"id": note_id})
+    await on_entity_write("note", note, None)
     
     return {"message": "Notiță ștearsă cu succes"}
 
+# ============== CLIENT DUPLICATES ==============
+
+# Legal-form words ignored when comparing company names ("SC Foo S.R.L." ~ "foo srl")
+LEGAL_FORM_WORDS = {"sc", "srl", "sa", "ii", "if", "ic", "pfa", "ong", "ltd", "llc", "gmbh", "inc"}
+DUPLICATE_MIN_SIMILARITY = 0.5
+
+def normalize_company_name(name: str) -> str:
+    words = WORD_RE.findall(fold_text(name or "").replace(".", ""))
+    core = [w for w in words if w not in LEGAL_FORM_WORDS]
+    return " ".join(core or words)
+
+def name_trigrams(normalized: str) -> set:
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    # Inverted index from name trigrams to client ids; similarity is the
+    # Jaccard index of the two trigram sets
+    def __init__(self):
+        self._postings = {}  # trigram -> set of client ids
+        self._clients = {}  # client id -> (company_name, trigrams)
+
+    def put(self, client_id: str, company_name: str):
+        self.remove(client_id)
+        grams = name_trigrams(normalize_company_name(company_name))
+        self._clients[client_id] = (company_name, grams)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(client_id)
+
+    def remove(self, client_id: str):
+        entry = self._clients.pop(client_id, None)
+        if entry is None:
+            return
+        for gram in entry[1]:
+            ids = self._postings.get(gram)
+            if ids is not None:
+                ids.discard(client_id)
+                if not ids:
+                    del self._postings[gram]
+
+    def apply(self, before: Optional[dict], after: Optional[dict]):
+        if after is None:
+            if before and before.get("id"):
+                self.remove(before["id"])
+        elif after.get("company_name") is not None:
+            self.put(after["id"], after["company_name"])
+
+    def similar(self, company_name: str, exclude_id: Optional[str] = None, limit: int = 5) -> List[dict]:
+        grams = name_trigrams(normalize_company_name(company_name))
+        shared = {}
+        for gram in grams:
+            for client_id in self._postings.get(gram, ()):
+                shared[client_id] = shared.get(client_id, 0) + 1
+        
+        matches = []
+        for client_id, common in shared.items():
+            if client_id == exclude_id:
+                continue
+            name, other = self._clients[client_id]
+            score = common / (len(grams) + len(other) - common)
+            if score >= DUPLICATE_MIN_SIMILARITY:
+                matches.append({"id": client_id, "company_name": name, "similarity": round(score, 3)})
+        matches.sort(key=lambda m: m["similarity"], reverse=True)
+        return matches[:limit]
+
+client_name_index = TrigramIndex()
+
+async def build_client_name_index():
+    index = TrigramIndex()
+    async for client_doc in db.clients.find({}, {"_id": 0, "id": 1, "company_name": 1}):
+        index.apply(None, client_doc)
+    return index
+
 # ============== CLIENT ROUTES ==============
 
-@api_router.get("/clients", response_model=List[dict])
-async def get_clients(current_user: dict = Depends(require_admin)):
-    clients = await db.clients.find({}, {"_id": 0}).to_list(1000)
-    return clients
+@api_router.get("/clients/duplicates", response_model=List[dict])
+async def find_duplicate_clients(
+    name: str = Query(..., min_length=1, max_length=200),
+    exclude_id: Optional[str] = None,
+    current_user: dict = Depends(require_admin)
+):
+    # In-memory lookup, cheap enough to call on every keystroke of the client form
+    return client_name_index.similar(name, exclude_id=exclude_id)
+
+CLIENT_SORT_FIELDS = {"name": "company_name", "budget": "budget", "created_at": "created_at"}
+CLIENT_FIELDS = set(ClientOut.model_fields)
+# Name ordering is case- and diacritic-aware; the name indexes use the same collation
+NAME_COLLATION = {"locale": "ro", "strength": 2}
+
+@api_router.get("/clients", response_model=List[ClientOut])
+async def get_clients(
+    request: Request,
+    response: Response,
+    status: Optional[str] = None,
+    project_type: Optional[str] = None,
+    min_budget: Optional[float] = None,
+    max_budget: Optional[float] = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    limit: int = Query(1000, ge=1, le=1000),
+    fields: Optional[str] = None,
+    current_user: dict = Depends(require_admin)
+):
+    # Keyset-paginated on (sort field, id); the next page's cursor is
+    # returned in the X-Next-Cursor header
+    not_modified = await revision_guard(request, response, current_user, "client")
+    if not_modified:
+        return not_modified
+    if sort not in CLIENT_SORT_FIELDS or order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="Sortare invalidă")
+    sort_field = CLIENT_SORT_FIELDS[sort]
+    descending = order == "desc"
+    selection = parse_fields(fields, CLIENT_FIELDS)
+    
+    conditions = []
+    if status:
+        conditions.append({"status": status})
+    if project_type:
+        conditions.append({"project_type": project_type})
+    budget_range = {}
+    if min_budget is not None:
+        budget_range["$gte"] = min_budget
+    if max_budget is not None:
+        budget_range["$lte"] = max_budget
+    if budget_range:
+        conditions.append({"budget": budget_range})
+    if cursor:
+        conditions.append(keyset_condition(sort_field, descending, *decode_cursor(cursor, 2)))
+    query = {"$and": conditions} if len(conditions) > 1 else (conditions[0] if conditions else {})
+    
+    # The sort key and id are always read so the cursor can be built
+    projection = fields_projection(selection, always=(sort_field, "id"))
+    
+    direction = -1 if descending else 1
+    find_options = {"collation": NAME_COLLATION} if sort == "name" else {}
+    clients = await db.clients.find(query, projection, **find_options).sort(
+        [(sort_field, direction), ("id", direction)]
+    ).to_list(limit + 1)
+    
+    if len(clients) > limit:
+        clients = clients[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(clients[-1].get(sort_field), clients[-1]["id"])
+    
+    return trusted_json(select_fields(clients, selection), response)
 
 @api_router.get("/clients/{client_id}", response_model=dict)
 async def get_client(client_id: str, current_user: dict = Depends(require_admin)):
@@ -532,6 +1913,7 @@ async def create_client(request: ClientCreate, current_user: dict = Depends(requ
         company_name=request.company_name,
         project_type=request.project_type,
         budget=request.budget,
+        monthly_fee=request.monthly_fee,
         status=request.status,
         contact_person=request.contact_person,
         contact_email=request.contact_email,
@@ -542,10 +1924,14 @@ async def create_client(request: ClientCreate, current_user: dict = Depends(requ
     
     doc = client.model_dump()
     doc["created_at"] = doc["created_at"].isoformat()
+    doc["updated_at"] = doc["created_at"]
+    
+    duplicates = client_name_index.similar(request.company_name)
     
     await db.clients.insert_one(doc)
+    await on_entity_write("client", None, doc)
     
-    return {"message": "Client creat cu succes", "client_id": client.id}
+    return {"message": "Client creat cu succes", "client_id": client.id, "possible_duplicates": duplicates}
 
 @api_router.put("/clients/{client_id}", response_model=dict)
 async def update_client(client_id: str, request: ClientUpdate, current_user: dict = Depends(require_admin)):
@@ -556,34 +1942,57 @@ async def update_client(client_id: str, request: ClientUpdate, current_user: dic
     update_data = {k: v for k, v in request.model_dump().items() if v is not None}
     
     if update_data:
-        await db.clients.update_one({"id": client_id}, {"$set": update_data})
+        update_data["updated_at"] = datetime.now(timezone.utc).isoformat()
+        before = await db.clients.find_one_and_update(
+            {"id": client_id}, {"$set": update_data}, projection=CLIENT_PREIMAGE_FIELDS
+        )
+        if before:
+            await on_entity_write("client", before, {**before, **update_data})
     
-    return {"message": "Client actualizat cu succes"}
+    duplicates = []
+    if "company_name" in update_data:
+        duplicates = client_name_index.similar(update_data["company_name"], exclude_id=client_id)
+    
+    return {"message": "Client actualizat cu succes", "possible_duplicates": duplicates}
 
 @api_router.delete("/clients/{client_id}", response_model=dict)
 async def delete_client(client_id: str, current_user: dict = Depends(require_admin)):
-    result = await db.clients.delete_one({"id": client_id})
-    if result.deleted_count == 0:
+    client_doc = await db.clients.find_one_and_delete({"id": client_id}, projection=CLIENT_PREIMAGE_FIELDS)
+    if not client_doc:
         raise HTTPException(status_code=404, detail="Client negăsit")
+    await on_entity_write("client", client_doc, None)
     
     return {"message": "Client șters cu succes"}
 
 # ============== FOLDER ROUTES ==============
 
 @api_router.get("/folders", response_model=List[dict])
-async def get_folders(client_id: Optional[str] = None, current_user: dict = Depends(require_admin)):
+async def get_folders(request: Request, response: Response, client_id: Optional[str] = None,
+                      current_user: dict = Depends(require_admin)):
+    not_modified = await revision_guard(request, response, current_user, "folder", "document", "client")
+    if not_modified:
+        return not_modified
     query = {}
     if client_id:
         query["client_id"] = client_id
     folders = await db.folders.find(query, {"_id": 0}).to_list(1000)
     
-    # Add client info to each folder
+    # Client names and document counts for all folders in two queries
+    clients, counts = await asyncio.gather(
+        db.clients.find(
+            {"id": {"$in": list({folder["client_id"] for folder in folders})}},
+            {"_id": 0, "id": 1, "company_name": 1}
+        ).to_list(None),
+        db.documents.aggregate([
+            {"$match": {"folder_id": {"$in": [folder["id"] for folder in folders]}}},
+            {"$group": {"_id": "$folder_id", "count": {"$sum": 1}}}
+        ]).to_list(None)
+    )
+    clients = {client_doc.pop("id"): client_doc for client_doc in clients}
+    counts = {row["_id"]: row["count"] for row in counts}
     for folder in folders:
-        client = await db.clients.find_one({"id": folder["client_id"]}, {"_id": 0, "company_name": 1})
-        folder["client"] = client
-        # Count documents in folder
-        doc_count = await db.documents.count_documents({"folder_id": folder["id"]})
-        folder["document_count"] = doc_count
+        folder["client"] = clients.get(folder["client_id"])
+        folder["document_count"] = counts.get(folder["id"], 0)
     
     return folders
 
@@ -602,38 +2011,54 @@ async def create_folder(request: FolderCreate, current_user: dict = Depends(requ
     
     doc = folder.model_dump()
     doc["created_at"] = doc["created_at"].isoformat()
+    doc["updated_at"] = doc["created_at"]
     
     await db.folders.insert_one(doc)
+    await on_entity_write("folder", None, doc)
     
     return {"message": "Folder creat cu succes", "folder_id": folder.id}
 
 @api_router.delete("/folders/{folder_id}", response_model=dict)
 async def delete_folder(folder_id: str, current_user: dict = Depends(require_admin)):
     # Delete all documents in folder first
+    documents = await db.documents.find({"folder_id": folder_id}, {"_id": 0, "id": 1, "folder_id": 1}).to_list(None)
     await db.documents.delete_many({"folder_id": folder_id})
+    for document in documents:
+        await on_entity_write("document", document, None)
     
-    result = await db.folders.delete_one({"id": folder_id})
-    if result.deleted_count == 0:
+    folder = await db.folders.find_one_and_delete({"id": folder_id}, projection={"_id": 0, "id": 1, "client_id": 1})
+    if not folder:
         raise HTTPException(status_code=404, detail="Folder negăsit")
+    await on_entity_write("folder", folder, None)
     
     return {"message": "Folder șters cu succes"}
 
 # ============== DOCUMENT ROUTES ==============
 
+DOCUMENT_LIST_FIELDS = (set(Document.model_fields) | {"updated_at"}) - {"file_data"}
+
 @api_router.get("/documents", response_model=List[dict])
-async def get_documents(folder_id: Optional[str] = None, current_user: dict = Depends(require_admin)):
+async def get_documents(
+    folder_id: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(require_admin)
+):
     query = {}
     if folder_id:
         query["folder_id"] = folder_id
     # Don't return file_data in list view (too large)
-    documents = await db.documents.find(query, {"_id": 0, "file_data": 0}).to_list(1000)
-    return documents
+    selection = parse_fields(fields, DOCUMENT_LIST_FIELDS)
+    projection = fields_projection(selection) if selection is not None else {"_id": 0, "file_data": 0}
+    documents = await db.documents.find(query, projection).to_list(1000)
+    return select_fields(documents, selection)
 
 @api_router.get("/documents/{document_id}", response_model=dict)
-async def get_document(document_id: str, current_user: dict = Depends(require_admin)):
+async def get_document(document_id: str, request: Request, current_user: dict = Depends(require_admin)):
     document = await db.documents.find_one({"id": document_id}, {"_id": 0})
     if not document:
         raise HTTPException(status_code=404, detail="Document negăsit")
+    if is_precompressed(document.get("file_type")):
+        request.state.compress = False
     return document
 
 @api_router.post("/documents", response_model=dict)
@@ -653,23 +2078,51 @@ async def create_document(request: DocumentCreate, current_user: dict = Depends(
     
     doc = document.model_dump()
     doc["created_at"] = doc["created_at"].isoformat()
+    doc["updated_at"] = doc["created_at"]
     
     await db.documents.insert_one(doc)
+    await on_entity_write("document", None, doc)
     
     return {"message": "Document încărcat cu succes", "document_id": document.id}
 
 @api_router.delete("/documents/{document_id}", response_model=dict)
 async def delete_document(document_id: str, current_user: dict = Depends(require_admin)):
-    result = await db.documents.delete_one({"id": document_id})
-    if result.deleted_count == 0:
+    document = await db.documents.find_one_and_delete(
+        {"id": document_id}, projection={"_id": 0, "id": 1, "folder_id": 1}
+    )
+    if not document:
         raise HTTPException(status_code=404, detail="Document negăsit")
+    await on_entity_write("document", document, None)
     
     return {"message": "Document șters cu succes"}
 
+# ============== REPORT AUTOSAVE ==============
+
+def report_conflict(version: int) -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="Raportul a fost modificat între timp. Reîncărcați conținutul.",
+        headers={"X-Report-Version": str(version)}
+    )
+
 # ============== REPORT ROUTES ==============
 
-@api_router.get("/reports", response_model=List[dict])
-async def get_reports(user_id: Optional[str] = None, date: Optional[str] = None, current_user: dict = Depends(get_current_user)):
+REPORT_FIELDS = set(ReportOut.model_fields) - {"user"}
+
+@api_router.get("/reports", response_model=List[ReportOut])
+async def get_reports(
+    request: Request,
+    response: Response,
+    user_id: Optional[str] = None,
+    date: Optional[str] = None,
+    fields: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    not_modified = await revision_guard(request, response, current_user, "report", "user")
+    if not_modified:
+        return not_modified
+    selection = parse_fields(fields, REPORT_FIELDS, {"user": USER_FIELDS},
+                             restricted=user_restrictions(current_user, "user"))
     query = {}
     
     if current_user["role"] == "admin":
@@ -683,14 +2136,17 @@ async def get_reports(user_id: Optional[str] = None, date: Optional[str] = None,
     if date:
         query["date"] = date
     
-    reports = await db.reports.find(query, {"_id": 0}).sort("date", -1).to_list(1000)
+    projection = fields_projection(selection, {"user": ("user_id",)})
+    reports = await db.reports.find(query, projection).sort("date", -1).to_list(1000)
     
     # Add user info
-    for report in reports:
-        user = await db.users.find_one({"id": report["user_id"]}, {"_id": 0, "password_hash": 0})
-        report["user"] = user
+    if wants(selection, "user"):
+        subs = selection["user"] if selection else None
+        users = await load_users((r.get("user_id") for r in reports), user_projection(current_user, subs))
+        for report in reports:
+            report["user"] = users.get(report.get("user_id"))
     
-    return reports
+    return trusted_json(select_fields(reports, selection), response)
 
 @api_router.get("/reports/{report_id}", response_model=dict)
 async def get_report(report_id: str, current_user: dict = Depends(get_current_user)):
@@ -706,36 +2162,31 @@ async def get_report(report_id: str, current_user: dict = Depends(get_current_us
 
 @api_router.post("/reports", response_model=dict)
 async def create_report(request: ReportCreate, current_user: dict = Depends(get_current_user)):
-    # Check if report for this date already exists
-    existing = await db.reports.find_one({
-        "user_id": current_user["user_id"],
-        "date": request.date
-    })
-    
-    if existing:
-        # Update existing report
-        await db.reports.update_one(
-            {"id": existing["id"]},
-            {"$set": {
-                "content": request.content,
-                "updated_at": datetime.now(timezone.utc).isoformat()
-            }}
-        )
-        return {"message": "Raport actualizat cu succes", "report_id": existing["id"]}
-    
-    report = Report(
-        date=request.date,
-        content=request.content,
-        user_id=current_user["user_id"]
+    # One upsert on (user_id, date) instead of a lookup followed by a write
+    now = datetime.now(timezone.utc).isoformat()
+    new_id = str(uuid.uuid4())
+    report = await db.reports.find_one_and_update(
+        {"user_id": current_user["user_id"], "date": request.date},
+        {
+            "$set": {"content": request.content, "updated_at": now},
+            "$inc": {"version": 1},
+            "$setOnInsert": {"id": new_id, "created_at": now}
+        },
+        projection={"_id": 0, "id": 1, "version": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
     )
+    after = {
+        "id": report["id"], "user_id": current_user["user_id"], "date": request.date,
+        "content": request.content, "version": report["version"], "updated_at": now
+    }
     
-    doc = report.model_dump()
-    doc["created_at"] = doc["created_at"].isoformat()
-    doc["updated_at"] = doc["updated_at"].isoformat()
-    
-    await db.reports.insert_one(doc)
+    if report["id"] != new_id:
+        await on_entity_write("report", {"id": report["id"], "user_id": current_user["user_id"]}, after)
+        return {"message": "Raport actualizat cu succes", "report_id": report["id"], "version": report["version"]}
     
-    return {"message": "Raport creat cu succes", "report_id": report.id}
+    await on_entity_write("report", None, {**after, "created_at": now})
+    return {"message": "Raport creat cu succes", "report_id": report["id"], "version": report["version"]}
 
 @api_router.put("/reports/{report_id}", response_model=dict)
 async def update_report(report_id: str, request: ReportUpdate, current_user: dict = Depends(get_current_user)):
@@ -751,9 +2202,61 @@ async def update_report(report_id: str, request: ReportUpdate, current_user: dic
     if request.content is not None:
         update_data["content"] = request.content
     
-    await db.reports.update_one({"id": report_id}, {"$set": update_data})
+    before = report
+    report = await db.reports.find_one_and_update(
+        {"id": report_id},
+        {"$set": update_data, "$inc": {"version": 1}},
+        projection={"_id": 0, "version": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not report:
+        # Deleted between the lookup and the update
+        raise HTTPException(status_code=404, detail="Raport negăsit")
+    await on_entity_write("report", before, {**before, **update_data, "version": report["version"]})
+    
+    return {"message": "Raport actualizat cu succes", "version": report["version"]}
+
+@api_router.patch("/reports/{report_id}", response_model=dict)
+async def patch_report(report_id: str, request: ReportPatch, current_user: dict = Depends(get_current_user)):
+    # Autosave: apply text deltas to the stored version and write the result
+    # straight back. The write only lands if the report is still at that
+    # version, so every worker sees the same report and a concurrent save
+    # turns this one into a 409 instead of being overwritten
+    report = await db.reports.find_one(
+        {"id": report_id},
+        {"_id": 0, "id": 1, "user_id": 1, "date": 1, "content": 1, "version": 1}
+    )
+    if not report:
+        raise HTTPException(status_code=404, detail="Raport negăsit")
+    report.setdefault("version", 0)
+    
+    if report["user_id"] != current_user["user_id"] and current_user["role"] != "admin":
+        raise HTTPException(status_code=403, detail="Acces interzis")
     
-    return {"message": "Raport actualizat cu succes"}
+    if request.base_version != report["version"]:
+        raise report_conflict(report["version"])
+    
+    try:
+        content = apply_text_delta(report["content"], request.ops)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Modificare invalidă")
+    
+    update_data = {
+        "content": content,
+        "version": report["version"] + 1,
+        "updated_at": datetime.now(timezone.utc).isoformat()
+    }
+    # Reports saved before versioning have no version field
+    stored_version = report["version"] or {"$in": [0, None]}
+    result = await db.reports.update_one({"id": report_id, "version": stored_version}, {"$set": update_data})
+    if result.matched_count == 0:
+        current = await db.reports.find_one({"id": report_id}, {"_id": 0, "version": 1})
+        if not current:
+            raise HTTPException(status_code=404, detail="Raport negăsit")
+        raise report_conflict(current.get("version", 0))
+    
+    await on_entity_write("report", report, {**report, **update_data})
+    return {"message": "Raport salvat", "report_id": report_id, "version": update_data["version"]}
 
 @api_router.delete("/reports/{report_id}", response_model=dict)
 async def delete_report(report_id: str, current_user: dict = Depends(get_current_user)):
@@ -766,76 +2269,1321 @@ async def delete_report(report_id: str, current_user: dict = Depends(get_current
         raise HTTPException(status_code=403, detail="Acces interzis")
     
     await db.reports.delete_one({"id": report_id})
+    await on_entity_write("report", report, None)
     
     return {"message": "Raport șters cu succes"}
 
 # ============== DASHBOARD STATS ==============
 
-@api_router.get("/dashboard/stats", response_model=dict)
-async def get_dashboard_stats(current_user: dict = Depends(get_current_user)):
+async def compute_admin_stats() -> dict:
+    # Totals come from the counters document; only the employee list and the
+    # recent tasks are read from their collections, all concurrently. The
+    # recent tasks are a plain sorted find with a server-side limit, so Mongo
+    # walks the created_at index and stops after five documents
+    stats, employees, recent_tasks = await asyncio.gather(
+        db.stats.find_one({"_id": STATS_ID}, {"_id": 0, "tasks.by_assignee": 0}),
+        db.users.find({"role": "employee"}, {"_id": 0, "password_hash": 0}).to_list(100),
+        db.tasks.find({}, TASK_PROJECTION).sort("created_at", -1).limit(5).to_list(5)
+    )
+    stats = stats or {}
+    tasks = stats.get("tasks", {})
+    by_status = tasks.get("by_status", {})
+    clients = stats.get("clients", {})
+    
+    revenue_by_type = {
+        counter_value(ptype): totals.get("budget", 0)
+        for ptype, totals in clients.get("by_type", {}).items()
+        if totals.get("count", 0) > 0
+    }
+    
+    return {
+        "total_employees": stats.get("users", {}).get("employees", 0),
+        "total_tasks": tasks.get("total", 0),
+        "pending_tasks": by_status.get("pending", 0),
+        "in_progress_tasks": by_status.get("in_progress", 0),
+        "completed_tasks": by_status.get("completed", 0),
+        "total_clients": clients.get("total", 0),
+        "active_clients": clients.get("active", 0),
+        "total_budget": clients.get("total_budget", 0),
+        "monthly_revenue": clients.get("monthly_revenue", 0),
+        "employees": employees,
+        "recent_tasks": await hydrate_assignees(recent_tasks),
+        "revenue_by_type": revenue_by_type
+    }
+
+async def compute_employee_stats(user_id: str) -> dict:
+    # A single projected read of the employee's counters
+    path = f"tasks.by_assignee.{counter_key(user_id)}"
+    stats = await db.stats.find_one({"_id": STATS_ID}, {"_id": 0, path: 1}) or {}
+    mine = stats.get("tasks", {}).get("by_assignee", {}).get(counter_key(user_id), {})
+    by_status = mine.get("by_status", {})
+    
+    return {
+        "my_tasks": mine.get("total", 0),
+        "my_pending": by_status.get("pending", 0),
+        "my_in_progress": by_status.get("in_progress", 0),
+        "my_completed": by_status.get("completed", 0)
+    }
+
+async def dashboard_stats(current_user: dict) -> dict:
     if current_user["role"] == "admin":
-        total_employees = await db.users.count_documents({"role": "employee"})
-        total_tasks = await db.tasks.count_documents({})
-        pending_tasks = await db.tasks.count_documents({"status": "pending"})
-        in_progress_tasks = await db.tasks.count_documents({"status": "in_progress"})
-        completed_tasks = await db.tasks.count_documents({"status": "completed"})
-        total_clients = await db.clients.count_documents({})
-        active_clients = await db.clients.count_documents({"status": "activ"})
-        
-        # Calculate total budget and monthly revenue
-        clients = await db.clients.find({}, {"_id": 0, "budget": 1, "monthly_fee": 1, "project_type": 1, "status": 1}).to_list(1000)
-        total_budget = sum(c.get("budget", 0) for c in clients)
-        monthly_revenue = sum(c.get("monthly_fee", 0) or 0 for c in clients if c.get("status") == "activ")
-        
-        # Get employees list
-        employees = await db.users.find({"role": "employee"}, {"_id": 0, "password_hash": 0}).to_list(100)
+        return await dashboard_cache.get_or_compute("admin", compute_admin_stats)
+    user_id = current_user["user_id"]
+    return await dashboard_cache.get_or_compute(f"employee:{user_id}", lambda: compute_employee_stats(user_id))
+
+@api_router.get("/dashboard/stats", response_model=dict)
+async def get_dashboard_stats(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
+    not_modified = await revision_guard(request, response, current_user, "task", "client", "user", "stats")
+    if not_modified:
+        return not_modified
+    return await dashboard_stats(current_user)
+
+@api_router.post("/dashboard/stats/reconcile", response_model=dict)
+async def reconcile_dashboard_stats(current_user: dict = Depends(require_admin)):
+    drift = await rebuild_stats()
+    return {"message": "Statistici recalculate", "drift": drift}
+
+# ============== DASHBOARD ROLLUPS ==============
+#
+# One `rollups` document per UTC day (_id = "YYYY-MM-DD") with the day's flow
+# metrics and the active MRR observed that day. update_rollups() recounts only
+# the days from its last watermark onwards, so runs are cheap and idempotent.
+
+ROLLUP_STATE_ID = "rollup_watermark"
+ROLLUP_GRACE = timedelta(minutes=5)  # covers timestamps taken just before a run but written after it
+
+# metric -> (collection, ISO timestamp field)
+ROLLUP_SOURCES = {
+    "tasks_created": ("tasks", "created_at"),
+    "tasks_completed": ("tasks", "completed_at"),
+    "new_clients": ("clients", "created_at"),
+    "reports_filed": ("reports", "created_at"),
+}
+
+async def update_rollups() -> int:
+    now = datetime.now(timezone.utc)
+    state = await db.stats.find_one({"_id": ROLLUP_STATE_ID}) or {}
+    since = state.get("watermark", "")[:10]
+    
+    days = {}
+    if since:
+        # Recounted days start from zero so deletions are reflected too
+        day = datetime.fromisoformat(since).date()
+        while day <= now.date():
+            days[day.isoformat()] = {metric: 0 for metric in ROLLUP_SOURCES}
+            day += timedelta(days=1)
+    
+    for metric, (collection, field) in ROLLUP_SOURCES.items():
+        rows = await db[collection].aggregate([
+            {"$match": {field: {"$gte": since}}},
+            {"$group": {"_id": {"$substrBytes": [f"${field}", 0, 10]}, "count": {"$sum": 1}}}
+        ]).to_list(None)
+        for row in rows:
+            days.setdefault(row["_id"], {metric: 0 for metric in ROLLUP_SOURCES})[metric] = row["count"]
+    
+    # MRR is a level, not a flow: record today's value from the counters document
+    counters = await db.stats.find_one({"_id": STATS_ID}, {"_id": 0, "clients.monthly_revenue": 1}) or {}
+    today = days.setdefault(now.date().isoformat(), {metric: 0 for metric in ROLLUP_SOURCES})
+    today["active_mrr"] = counters.get("clients", {}).get("monthly_revenue", 0)
+    
+    await db.rollups.bulk_write(
+        [UpdateOne({"_id": day}, {"$set": metrics}, upsert=True) for day, metrics in days.items()],
+        ordered=False
+    )
+    await db.stats.update_one(
+        {"_id": ROLLUP_STATE_ID},
+        {"$set": {"watermark": (now - ROLLUP_GRACE).isoformat()}},
+        upsert=True
+    )
+    return len(days)
+
+async def update_rollups_periodically():
+    while True:
+        try:
+            await update_rollups()
+        except Exception:
+            logger.exception("Dashboard rollup failed")
+        await asyncio.sleep(ROLLUP_INTERVAL_SECONDS)
+
+def trend_bucket(day, period: str) -> str:
+    if period == "week":
+        year, week, _ = day.isocalendar()
+        return f"{year}-W{week:02d}"
+    return day.strftime("%Y-%m")
+
+def trend_period_start(day, period: str, back: int = 0):
+    # First day of the period containing `day`, moved `back` periods earlier
+    if period == "week":
+        return day - timedelta(days=day.weekday(), weeks=back)
+    month_index = day.year * 12 + day.month - 1 - back
+    return day.replace(year=month_index // 12, month=month_index % 12 + 1, day=1)
+
+@api_router.get("/dashboard/trends", response_model=dict)
+async def get_dashboard_trends(period: str = "week", periods: int = 12, current_user: dict = Depends(require_admin)):
+    if period not in ("week", "month"):
+        raise HTTPException(status_code=400, detail="Perioadă invalidă (week sau month)")
+    periods = max(1, min(periods, 104))
+    
+    today = datetime.now(timezone.utc).date()
+    start = trend_period_start(today, period, periods - 1)
+    
+    series = {}
+    for back in range(periods - 1, -1, -1):
+        period_start = trend_period_start(today, period, back)
+        series[trend_bucket(period_start, period)] = {
+            "period": trend_bucket(period_start, period),
+            "start": period_start.isoformat(),
+            **{metric: 0 for metric in ROLLUP_SOURCES},
+            "active_mrr": None
+        }
+    
+    rows, previous = await asyncio.gather(
+        db.rollups.find({"_id": {"$gte": start.isoformat()}}).sort("_id", 1).to_list(None),
+        db.rollups.find_one({"_id": {"$lt": start.isoformat()}, "active_mrr": {"$exists": True}}, sort=[("_id", -1)])
+    )
+    for row in rows:
+        bucket = series.get(trend_bucket(datetime.fromisoformat(row["_id"]).date(), period))
+        if bucket is None:
+            continue
+        for metric in ROLLUP_SOURCES:
+            bucket[metric] += row.get(metric, 0)
+        if "active_mrr" in row:
+            bucket["active_mrr"] = row["active_mrr"]
+    
+    # Carry the last observed MRR forward through periods without a snapshot
+    mrr = previous.get("active_mrr") if previous else None
+    for bucket in series.values():
+        if bucket["active_mrr"] is None:
+            bucket["active_mrr"] = mrr
+        mrr = bucket["active_mrr"]
+    
+    return {"period": period, "series": list(series.values())}
+
+# ============== TASK CYCLE TIMES ==============
+#
+# Every status change is appended to `task_history` ({task_id, from, to, at,
+# by}). The same write folds the change into `cycle_stats`, one document per
+# dimension ("all", "priority:<p>", "user:<id>"):
+#   time_in.<status>.<bucket>  how long tasks stayed in a status before leaving it
+#   cycle.<bucket>             first start (or creation) to completion
+#   throughput.<YYYY-Www>      completions per ISO week
+#   completed                  completions overall
+# Durations go into log-spaced buckets (a DDSketch-style quantile sketch): any
+# quantile read back from the counts is within CYCLE_SKETCH_ACCURACY of the
+# true value, and updates are plain $inc, so reads never touch the history.
+
+CYCLE_SKETCH_ACCURACY = 0.02
+CYCLE_SKETCH_GAMMA = (1 + CYCLE_SKETCH_ACCURACY) / (1 - CYCLE_SKETCH_ACCURACY)
+
+def sketch_bucket(seconds: float) -> int:
+    # Anything under a second shares bucket 0
+    return max(0, math.ceil(math.log(max(seconds, 1.0), CYCLE_SKETCH_GAMMA)))
+
+def sketch_quantile(buckets: dict, q: float) -> Optional[float]:
+    counts = sorted((int(b), n) for b, n in buckets.items() if n > 0)
+    total = sum(n for _, n in counts)
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for bucket, n in counts:
+        seen += n
+        if seen > rank:
+            break
+    # Midpoint of the bucket (gamma^(i-1), gamma^i], in relative terms
+    return 2 * CYCLE_SKETCH_GAMMA ** bucket / (CYCLE_SKETCH_GAMMA + 1)
+
+def elapsed_seconds(start: Optional[str], end: Optional[str]) -> Optional[float]:
+    try:
+        return (datetime.fromisoformat(end) - datetime.fromisoformat(start)).total_seconds()
+    except (TypeError, ValueError):
+        return None
+
+async def record_status_change(before: Optional[dict], after: dict, at: str, by: str):
+    old = before.get("status") if before else None
+    new = after.get("status")
+    if old == new:
+        return
+    await db.task_history.insert_one({"task_id": after["id"], "from": old, "to": new, "at": at, "by": by})
+    
+    inc = {}
+    if before:
+        # Tasks created before status_changed_at existed count from their creation
+        spent = elapsed_seconds(before.get("status_changed_at") or before.get("created_at"), at)
+        if spent is not None:
+            inc[f"time_in.{counter_key(old)}.{sketch_bucket(spent)}"] = 1
+    if new == "completed":
+        cycle = elapsed_seconds(after.get("started_at") or after.get("created_at"), at)
+        if cycle is not None:
+            inc[f"cycle.{sketch_bucket(cycle)}"] = 1
+        inc[f"throughput.{trend_bucket(datetime.fromisoformat(at).date(), 'week')}"] = 1
+        inc["completed"] = 1
+    if not inc:
+        return
+    
+    dimensions = ["all", f"priority:{after.get('priority') or 'medium'}"]
+    dimensions += [f"user:{user_id}" for user_id in set(after.get("assigned_to") or [])]
+    await db.cycle_stats.bulk_write(
+        [UpdateOne({"_id": dimension}, {"$inc": inc}, upsert=True) for dimension in dimensions],
+        ordered=False
+    )
+
+def summarize_durations(buckets: dict) -> dict:
+    def hours(q):
+        value = sketch_quantile(buckets, q)
+        return round(value / 3600, 2) if value is not None else None
+    return {"count": sum(buckets.values()), "median_hours": hours(0.5), "p90_hours": hours(0.9)}
+
+@api_router.get("/dashboard/cycle-times", response_model=List[dict])
+async def get_cycle_times(group: str = "priority", weeks: int = 12, current_user: dict = Depends(require_admin)):
+    if group not in ("all", "priority", "employee"):
+        raise HTTPException(status_code=400, detail="Grupare invalidă (all, priority sau employee)")
+    weeks = max(1, min(weeks, 104))
+    
+    if group == "all":
+        query = {"_id": "all"}
+    else:
+        query = {"_id": {"$regex": "^priority:" if group == "priority" else "^user:"}}
+    rows = await db.cycle_stats.find(query).to_list(1000)
+    
+    names = {}
+    if group == "employee":
+        names = await load_users((row["_id"][len("user:"):] for row in rows), {"_id": 0, "name": 1})
+    
+    today = datetime.now(timezone.utc).date()
+    week_keys = [trend_bucket(trend_period_start(today, "week", back), "week") for back in range(weeks - 1, -1, -1)]
+    
+    result = []
+    for row in rows:
+        key = row["_id"].partition(":")[2] or row["_id"]
+        entry = {"key": key}
+        if group == "employee":
+            entry["name"] = names.get(key, {}).get("name")
+        throughput = row.get("throughput", {})
+        entry.update({
+            "completed": row.get("completed", 0),
+            "cycle_time": summarize_durations(row.get("cycle", {})),
+            "time_in_status": {
+                counter_value(status): summarize_durations(buckets)
+                for status, buckets in row.get("time_in", {}).items()
+            },
+            "throughput": [{"week": week, "completed": throughput.get(week, 0)} for week in week_keys]
+        })
+        result.append(entry)
+    
+    result.sort(key=lambda e: -e["completed"])
+    return result
+
+# ============== DUE-DATE REMINDERS ==============
+#
+# Upcoming deadlines sit in a min-heap ordered by the time their reminder
+# fires; the scheduler sleeps until the head is due (or a write brings in an
+# earlier one) instead of polling the tasks collection. Only deadlines inside
+# the horizon are held in memory; a sentinel entry at the horizon loads the
+# next window with one indexed range query on due_date.
+#
+# Notifications are upserted on (user_id, task_id, type, due_date), so a
+# restart (which reloads from the persisted watermark) or a second worker
+# never delivers the same reminder twice.
+
+REMINDER_STATE_ID = "reminder_watermark"
+REMINDER_REFILL = "refill"
+
+def task_deadline(due_date: Optional[str]) -> Optional[float]:
+    # A plain date is due at the end of that day (UTC)
+    if not due_date:
+        return None
+    try:
+        if len(due_date) <= 10:
+            deadline = datetime.strptime(due_date, "%Y-%m-%d").replace(tzinfo=timezone.utc) + timedelta(days=1)
+        else:
+            deadline = datetime.fromisoformat(due_date)
+            if deadline.tzinfo is None:
+                deadline = deadline.replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+    return deadline.timestamp()
+
+class ReminderScheduler:
+    # Fires "task_due_soon" and "task_overdue" notifications for open tasks
+    def __init__(self, due_soon_seconds: float, horizon_seconds: float):
+        self.due_soon = due_soon_seconds
+        self.horizon_seconds = horizon_seconds
+        self._heap = []  # (fire_at, seq, kind, task_id, due_date)
+        self._seq = 0
+        self._tasks = {}  # task id -> {"due_date", "title", "assigned_to"} for deadlines in the window
+        self._horizon = 0.0
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def _push(self, fire_at: float, kind: str, task_id: Optional[str] = None, due_date: Optional[str] = None):
+        self._seq += 1
+        heapq.heappush(self._heap, (fire_at, self._seq, kind, task_id, due_date))
+        if self._heap[0][1] == self._seq:
+            self._wake.set()  # new earliest entry: re-arm the sleep
+
+    def track(self, task: dict):
+        # Schedule both reminders of an open task whose deadline falls inside the window
+        deadline = task_deadline(task.get("due_date"))
+        if task.get("status") == "completed" or deadline is None or deadline - self.due_soon > self._horizon:
+            self._tasks.pop(task["id"], None)
+            return
+        current = self._tasks.get(task["id"])
+        self._tasks[task["id"]] = {
+            "due_date": task["due_date"],
+            "title": task.get("title"),
+            "assigned_to": list(task.get("assigned_to") or [])
+        }
+        if current and current["due_date"] == task["due_date"]:
+            return  # already scheduled for this deadline
+        self._push(deadline - self.due_soon, "task_due_soon", task["id"], task["due_date"])
+        self._push(deadline, "task_overdue", task["id"], task["due_date"])
+
+    def apply(self, before: Optional[dict], after: Optional[dict]):
+        # Superseded heap entries are skipped when popped (lazy deletion)
+        if after is None:
+            if before and before.get("id"):
+                self._tasks.pop(before["id"], None)
+            return
+        self.track(after)
+
+    async def load(self, since: float, until: float):
+        # Deadlines whose reminders fire in (since, until]
+        self._horizon = until
+        first_day = datetime.fromtimestamp(since, timezone.utc).date() - timedelta(days=1)
+        last_day = datetime.fromtimestamp(until + self.due_soon, timezone.utc).date()
+        query = {
+            "status": {"$ne": "completed"},
+            "due_date": {"$gte": first_day.isoformat(), "$lte": last_day.isoformat() + "\uffff"}
+        }
+        async for task in db.tasks.find(query, TASK_PREIMAGE_FIELDS):
+            deadline = task_deadline(task.get("due_date"))
+            if deadline is not None and deadline > since:
+                self.track(task)
+        self._push(until, REMINDER_REFILL)
+
+    async def fire(self, kind: str, task_id: str, due_date: str, fire_at: float):
+        task = self._tasks.get(task_id)
+        if task is None or task["due_date"] != due_date:
+            return  # task completed, deleted or rescheduled since this was queued
+        created_at = datetime.now(timezone.utc).isoformat()
+        for user_id in task["assigned_to"]:
+            notification = {"id": str(uuid.uuid4()), "title": task["title"], "read": False, "created_at": created_at}
+            result = await db.notifications.update_one(
+                {"user_id": user_id, "task_id": task_id, "type": kind, "due_date": due_date},
+                {"$setOnInsert": notification},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                await on_entity_write("notification", None, {
+                    **notification, "user_id": user_id, "task_id": task_id, "type": kind, "due_date": due_date
+                })
+        if kind == "task_overdue":
+            self._tasks.pop(task_id, None)
+        await db.stats.update_one({"_id": REMINDER_STATE_ID}, {"$max": {"watermark": fire_at}}, upsert=True)
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            delay = self._heap[0][0] - time.time() if self._heap else None
+            if delay is None or delay > 0:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            fire_at, _, kind, task_id, due_date = heapq.heappop(self._heap)
+            try:
+                if kind == REMINDER_REFILL:
+                    await self.load(fire_at, fire_at + self.horizon_seconds)
+                else:
+                    await self.fire(kind, task_id, due_date, fire_at)
+            except Exception:
+                logger.exception("Reminder %s for task %s failed", kind, task_id)
+
+    async def start(self):
+        # Resume from the last fired reminder so deadlines passed while the
+        # server was down still notify; a fresh install starts from now
+        state = await db.stats.find_one({"_id": REMINDER_STATE_ID}) or {}
+        now = time.time()
+        await self.load(state.get("watermark", now), now + self.horizon_seconds)
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+reminder_scheduler = ReminderScheduler(REMINDER_DUE_SOON_HOURS * 3600, REMINDER_HORIZON_DAYS * 86400)
+
+# ============== NOTIFICATION ROUTES ==============
+
+@api_router.get("/notifications", response_model=List[dict])
+async def get_notifications(
+    response: Response,
+    unread_only: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_current_user)
+):
+    # Newest first, keyset-paginated on (created_at, id) like the notes list
+    query = {"user_id": current_user["user_id"]}
+    if unread_only:
+        query["read"] = False
+    if cursor:
+        query.update(keyset_condition("created_at", True, *decode_cursor(cursor, 2)))
+    notifications = await db.notifications.find(query, {"_id": 0}).sort(
+        [("created_at", -1), ("id", -1)]
+    ).to_list(limit + 1)
+    if len(notifications) > limit:
+        notifications = notifications[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(notifications[-1]["created_at"], notifications[-1]["id"])
+    return notifications
+
+@api_router.get("/notifications/unread-count", response_model=dict)
+async def get_unread_notification_count(current_user: dict = Depends(get_current_user)):
+    count = await db.notifications.count_documents({"user_id": current_user["user_id"], "read": False})
+    return {"unread": count}
+
+@api_router.post("/notifications/read-all", response_model=dict)
+async def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
+    result = await db.notifications.update_many(
+        {"user_id": current_user["user_id"], "read": False}, {"$set": {"read": True}}
+    )
+    return {"message": "Notificări marcate ca citite", "updated": result.modified_count}
+
+@api_router.post("/notifications/{notification_id}/read", response_model=dict)
+async def mark_notification_read(notification_id: str, current_user: dict = Depends(get_current_user)):
+    result = await db.notifications.update_one(
+        {"id": notification_id, "user_id": current_user["user_id"]}, {"$set": {"read": True}}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Notificare negăsită")
+    return {"message": "Notificare marcată ca citită"}
+
+# ============== SEARCH ==============
+#
+# Backed by one Mongo text index per collection (default_language "romanian").
+# Text indexes v3 are diacritic-insensitive, so "sarcina" matches "sarcină"
+# and both ș/ş spellings. Snippets are cut and highlighted here with the same
+# folding; highlights are [start, end) offsets into the snippet.
+
+WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+def fold_text(text: str) -> str:
+    # Lowercase and strip diacritics one character at a time, so offsets in
+    # the folded text are offsets in the original
+    folded = []
+    for ch in text:
+        base = unicodedata.normalize("NFD", ch)[0]
+        if unicodedata.combining(base):
+            base = ch
+        lower = base.lower()
+        folded.append(lower if len(lower) == 1 else base)
+    return "".join(folded)
+
+def search_terms(q: str) -> List[str]:
+    # Words of the query minus negated ones, trimmed to a rough stem so that
+    # "clienti" also highlights "clientului" (the index itself stems properly)
+    terms = []
+    for match in WORD_RE.finditer(q):
+        if match.start() > 0 and q[match.start() - 1] == "-":
+            continue
+        term = fold_text(match.group())
+        terms.append(term[:max(4, len(term) - 2)])
+    return terms
+
+def search_snippet(text: Optional[str], terms: List[str]) -> dict:
+    text = text or ""
+    folded = fold_text(text)
+    words = [(m.start(), m.end()) for m in WORD_RE.finditer(folded) if any(m.group().startswith(t) for t in terms)]
+    
+    start = 0
+    if words and len(text) > SEARCH_SNIPPET_CHARS:
+        start = max(0, min(words[0][0] - SEARCH_SNIPPET_CHARS // 4, len(text) - SEARCH_SNIPPET_CHARS))
+    end = start + SEARCH_SNIPPET_CHARS
+    
+    snippet = text[start:end]
+    highlights = [[a - start, min(b, end) - start] for a, b in words if start <= a < end]
+    if start > 0:
+        snippet = "…" + snippet
+        highlights = [[a + 1, b + 1] for a, b in highlights]
+    if end < len(text):
+        snippet += "…"
+    return {"snippet": snippet, "highlights": highlights}
+
+async def search_collection(collection, query: dict, fields: dict, limit: int) -> List[dict]:
+    docs = await collection.find(
+        query, {"_id": 0, "score": {"$meta": "textScore"}, **fields}
+    ).sort([("score", {"$meta": "textScore"})]).limit(limit).to_list(limit)
+    # textScore depends on each index's weights and field lengths, so raw
+    # scores from different collections are not comparable: rank each
+    # collection's hits relative to its own best match
+    best = max((doc["score"] for doc in docs), default=0) or 1
+    for doc in docs:
+        doc["score"] = doc["score"] / best
+    return docs
+
+@api_router.get("/search", response_model=List[dict])
+async def search(
+    q: str = Query(..., min_length=2, max_length=200),
+    types: str = "notes,reports,tasks",
+    limit: int = Query(20, ge=1, le=100),
+    current_user: dict = Depends(get_current_user)
+):
+    wanted = {t.strip() for t in types.split(",") if t.strip()}
+    if not wanted or not wanted <= {"notes", "reports", "tasks"}:
+        raise HTTPException(status_code=400, detail="Tipuri de căutare invalide")
+    
+    is_admin = current_user["role"] == "admin"
+    text = {"$text": {"$search": q}}
+    queries = {}
+    # Same visibility as the list endpoints: notes are shared, employees only
+    # see their own reports and the tasks assigned to them
+    if "notes" in wanted:
+        queries["notes"] = search_collection(db.notes, text, {"id": 1, "title": 1, "content": 1, "created_at": 1}, limit)
+    if "reports" in wanted:
+        report_query = text if is_admin else {**text, "user_id": current_user["user_id"]}
+        queries["reports"] = search_collection(db.reports, report_query, {"id": 1, "date": 1, "content": 1, "user_id": 1}, limit)
+    if "tasks" in wanted:
+        task_query = text if is_admin else {**text, "assigned_to": current_user["user_id"]}
+        queries["tasks"] = search_collection(db.tasks, task_query, {"id": 1, "title": 1, "description": 1, "status": 1, "due_date": 1}, limit)
+    
+    found = dict(zip(queries, await asyncio.gather(*queries.values())))
+    terms = search_terms(q)
+    results = []
+    for doc in found.get("notes", []):
+        results.append({"type": "note", "id": doc["id"], "title": doc.get("title"), "date": doc.get("created_at"),
+                        "score": doc["score"], **search_snippet(doc.get("content"), terms)})
+    for doc in found.get("reports", []):
+        results.append({"type": "report", "id": doc["id"], "title": doc.get("date"), "date": doc.get("date"),
+                        "user_id": doc.get("user_id"), "score": doc["score"], **search_snippet(doc.get("content"), terms)})
+    for doc in found.get("tasks", []):
+        results.append({"type": "task", "id": doc["id"], "title": doc.get("title"), "date": doc.get("due_date"),
+                        "status": doc.get("status"), "score": doc["score"],
+                        **search_snippet(doc.get("description") or doc.get("title"), terms)})
+    
+    results.sort(key=lambda r: r["score"], reverse=True)
+    return results[:limit]
+
+# ============== AUTOCOMPLETE ==============
+
+# Candidates ranked per lookup; bounds the cost of one-letter queries
+AUTOCOMPLETE_SCAN_LIMIT = 200
+
+class PrefixIndex:
+    # Per-process index for the command palette: every word of an entry's
+    # labels, folded, in one sorted list of (token, kind, id). A prefix lookup
+    # is a bisection plus a walk over the matching tokens.
+    def __init__(self):
+        self._keys = []  # sorted (token, kind, id)
+        self._entries = {}  # (kind, id) -> {"label", "folded", "sublabel", "tokens", "assigned_to"}
+        self._bulk = False
+
+    def __len__(self):
+        return len(self._entries)
+
+    def put(self, kind: str, entity_id: str, label: str, texts: List[Optional[str]],
+            sublabel: Optional[str] = None, assigned_to=None):
+        self.remove(kind, entity_id)
+        tokens = sorted({token for text in texts if text for token in WORD_RE.findall(fold_text(text))})
+        self._entries[(kind, entity_id)] = {
+            "label": label,
+            "folded": fold_text(label),
+            "sublabel": sublabel,
+            "tokens": tokens,
+            "assigned_to": frozenset(assigned_to or ())
+        }
+        if self._bulk:
+            self._keys.extend((token, kind, entity_id) for token in tokens)
+        else:
+            for token in tokens:
+                bisect.insort(self._keys, (token, kind, entity_id))
+
+    @contextmanager
+    def bulk_load(self):
+        # For the initial build into an empty index: keys are appended and
+        # sorted once at the end instead of one insort (a list shift) each
+        self._bulk = True
+        try:
+            yield self
+        finally:
+            self._bulk = False
+            self._keys.sort()
+
+    def remove(self, kind: str, entity_id: str):
+        entry = self._entries.pop((kind, entity_id), None)
+        if entry is None:
+            return
+        for token in entry["tokens"]:
+            i = bisect.bisect_left(self._keys, (token, kind, entity_id))
+            if i < len(self._keys) and self._keys[i] == (token, kind, entity_id):
+                del self._keys[i]
+
+    def apply(self, kind: str, before: Optional[dict], after: Optional[dict]):
+        if after is None:
+            if before and before.get("id"):
+                self.remove(kind, before["id"])
+            return
+        if kind == "user":
+            self.put("user", after["id"], after.get("name") or "", [after.get("name"), after.get("email")],
+                     sublabel=after.get("email"))
+        elif kind == "client":
+            self.put("client", after["id"], after.get("company_name") or "", [after.get("company_name")],
+                     sublabel=after.get("project_type"))
+        elif kind == "task":
+            self.put("task", after["id"], after.get("title") or "", [after.get("title")],
+                     sublabel=after.get("status"), assigned_to=after.get("assigned_to"))
+
+    def search(self, q: str, kinds, limit: int, user_id: Optional[str] = None) -> List[dict]:
+        terms = WORD_RE.findall(fold_text(q))
+        if not terms:
+            return []
+        # Walk the longest term's range; the other terms must prefix some token too
+        lead = max(terms, key=len)
+        start = bisect.bisect_left(self._keys, (lead,))
+        seen, matches = set(), []
+        for i in range(start, len(self._keys)):
+            token, kind, entity_id = self._keys[i]
+            if not token.startswith(lead) or len(matches) >= AUTOCOMPLETE_SCAN_LIMIT:
+                break
+            if kind not in kinds or (kind, entity_id) in seen:
+                continue
+            seen.add((kind, entity_id))
+            entry = self._entries[(kind, entity_id)]
+            if user_id is not None and user_id not in entry["assigned_to"]:
+                continue
+            if all(any(t.startswith(term) for t in entry["tokens"]) for term in terms):
+                matches.append((kind, entity_id, entry))
         
-        # Get recent tasks
-        recent_tasks = await db.tasks.find({}, {"_id": 0}).sort("created_at", -1).to_list(5)
-        for task in recent_tasks:
-            assignees = []
-            if task.get("assigned_to"):
-                for user_id in task["assigned_to"]:
-                    assignee = await db.users.find_one({"id": user_id}, {"_id": 0, "password_hash": 0})
-                    if assignee:
-                        assignees.append(assignee)
-            task["assignees"] = assignees
+        folded_q = fold_text(q.strip())
+        matches.sort(key=lambda m: (not m[2]["folded"].startswith(folded_q), len(m[2]["label"]), m[2]["folded"]))
+        return [
+            {"type": kind, "id": entity_id, "label": entry["label"], "sublabel": entry["sublabel"]}
+            for kind, entity_id, entry in matches[:limit]
+        ]
+
+autocomplete_index = PrefixIndex()
+
+async def build_autocomplete_index():
+    index = PrefixIndex()
+    with index.bulk_load():
+        async for user in db.users.find({}, USER_PREIMAGE_FIELDS):
+            index.apply("user", None, user)
+        async for client_doc in db.clients.find({}, CLIENT_PREIMAGE_FIELDS):
+            index.apply("client", None, client_doc)
+        async for task in db.tasks.find({}, TASK_PREIMAGE_FIELDS):
+            index.apply("task", None, task)
+    return index
+
+# ?types= values and the index kinds they select
+AUTOCOMPLETE_TYPES = {"clients": "client", "users": "user", "tasks": "task"}
+
+@api_router.get("/autocomplete", response_model=List[dict])
+async def autocomplete(
+    q: str = Query(..., min_length=1, max_length=100),
+    types: str = "clients,users,tasks",
+    limit: int = Query(10, ge=1, le=50),
+    current_user: dict = Depends(get_current_user)
+):
+    names = {t.strip() for t in types.split(",") if t.strip()}
+    if not names or not names <= AUTOCOMPLETE_TYPES.keys():
+        raise HTTPException(status_code=400, detail="Tipuri invalide")
+    kinds = {AUTOCOMPLETE_TYPES[name] for name in names}
+    if current_user["role"] == "admin":
+        return autocomplete_index.search(q, kinds, limit)
+    # Employees can't list clients or users; they only see tasks assigned to them
+    return autocomplete_index.search(q, kinds & {"task"}, limit, user_id=current_user["user_id"])
+
+# ============== WORKLOAD ==============
+
+# Longest range the workload grid accepts, in days
+WORKLOAD_MAX_DAYS = 366
+
+def task_interval(task: Optional[dict]) -> Optional[tuple]:
+    # An open task with a deadline occupies [start_date, due_date]; without a
+    # start date it is counted from the day it was created
+    if not task or task.get("status") == "completed" or not task.get("due_date"):
+        return None
+    end = task["due_date"][:10]
+    start = str(task.get("start_date") or task.get("created_at") or end)[:10]
+    return (min(start, end), end)
+
+class AssigneeIntervals:
+    # One assignee's intervals sorted by start, read as an implicit balanced
+    # tree (the middle of a slice is its root); _max_end[i] is the latest end
+    # in the subtree rooted at i. Writes only mark it stale; the next query
+    # rebuilds it in O(m).
+    def __init__(self):
+        self._items = []  # sorted (start, end, task_id)
+        self._max_end = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def add(self, item: tuple):
+        bisect.insort(self._items, item)
+        self._max_end = None
+
+    def remove(self, item: tuple):
+        i = bisect.bisect_left(self._items, item)
+        if i < len(self._items) and self._items[i] == item:
+            del self._items[i]
+            self._max_end = None
+
+    def _build(self, lo: int, hi: int) -> str:
+        if lo >= hi:
+            return ""
+        mid = (lo + hi) // 2
+        self._max_end[mid] = max(self._items[mid][1], self._build(lo, mid), self._build(mid + 1, hi))
+        return self._max_end[mid]
+
+    def overlapping(self, start: str, end: str, first_only: bool = False) -> List[tuple]:
+        # Intervals with item.start <= end and item.end >= start
+        if self._max_end is None:
+            self._max_end = [""] * len(self._items)
+            self._build(0, len(self._items))
+        found = []
+        stack = [(0, len(self._items))]
+        while stack and not (first_only and found):
+            lo, hi = stack.pop()
+            if lo >= hi:
+                continue
+            mid = (lo + hi) // 2
+            if self._max_end[mid] < start:
+                continue  # nothing in this subtree reaches the range
+            item = self._items[mid]
+            if item[0] <= end:
+                if item[1] >= start:
+                    found.append(item)
+                stack.append((mid + 1, hi))
+            stack.append((lo, mid))
+        return found
+
+class IntervalIndex:
+    # Per-process index of open task date ranges, one interval tree per assignee
+    def __init__(self):
+        self._trees = {}  # user id -> AssigneeIntervals
+        self._tasks = {}  # task id -> ((start, end), assignee ids)
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def put(self, task: dict):
+        self.remove(task["id"])
+        interval = task_interval(task)
+        assignees = frozenset(task.get("assigned_to") or ())
+        if interval is None or not assignees:
+            return
+        self._tasks[task["id"]] = (interval, assignees)
+        for user_id in assignees:
+            self._trees.setdefault(user_id, AssigneeIntervals()).add((*interval, task["id"]))
+
+    def remove(self, task_id: str):
+        entry = self._tasks.pop(task_id, None)
+        if entry is None:
+            return
+        interval, assignees = entry
+        for user_id in assignees:
+            tree = self._trees.get(user_id)
+            if tree is not None:
+                tree.remove((*interval, task_id))
+                if not tree:
+                    del self._trees[user_id]
+
+    def apply(self, before: Optional[dict], after: Optional[dict]):
+        if after is None:
+            if before and before.get("id"):
+                self.remove(before["id"])
+            return
+        self.put(after)
+
+    def overlapping(self, user_id: str, start: str, end: str) -> List[tuple]:
+        tree = self._trees.get(user_id)
+        return tree.overlapping(start, end) if tree else []
+
+    def is_free(self, user_id: str, start: str, end: str) -> bool:
+        tree = self._trees.get(user_id)
+        return not tree or not tree.overlapping(start, end, first_only=True)
+
+    def daily_load(self, user_id: str, first_day, days: int) -> List[int]:
+        # Open tasks per day, from a difference array over the overlapping intervals
+        last = (first_day + timedelta(days=days - 1)).isoformat()
+        delta = [0] * (days + 1)
+        for start, end, _ in self.overlapping(user_id, first_day.isoformat(), last):
+            try:
+                lo = max((datetime.strptime(start, "%Y-%m-%d").date() - first_day).days, 0)
+                hi = min((datetime.strptime(end, "%Y-%m-%d").date() - first_day).days, days - 1)
+            except ValueError:
+                continue
+            delta[lo] += 1
+            delta[hi + 1] -= 1
+        load, running = [], 0
+        for d in delta[:days]:
+            running += d
+            load.append(running)
+        return load
+
+workload_index = IntervalIndex()
+
+async def build_workload_index():
+    index = IntervalIndex()
+    async for task in db.tasks.find({"status": {"$ne": "completed"}, "due_date": {"$nin": [None, ""]}},
+                                    TASK_PREIMAGE_FIELDS):
+        index.put(task)
+    return index
+
+def parse_day_range(start: str, end: str) -> tuple:
+    try:
+        first = datetime.strptime(start, "%Y-%m-%d").date()
+        last = datetime.strptime(end, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dată invalidă")
+    days = (last - first).days + 1
+    if days < 1 or days > WORKLOAD_MAX_DAYS:
+        raise HTTPException(status_code=400, detail="Interval invalid")
+    return first, days
+
+@api_router.get("/workload", response_model=dict)
+async def get_workload(
+    start: str,
+    end: str,
+    user_id: Optional[str] = None,
+    max_concurrent: int = Query(3, ge=1),
+    current_user: dict = Depends(require_admin)
+):
+    # Open tasks per employee per day; days above max_concurrent are overbooked
+    first, days = parse_day_range(start, end)
+    # The grid plans employees' time; admins are left out
+    query = {"role": "employee", **({"id": user_id} if user_id else {})}
+    users = await db.users.find(query, {"_id": 0, "id": 1, "name": 1}).sort("name", 1).to_list(1000)
+    
+    employees = []
+    for user in users:
+        load = workload_index.daily_load(user["id"], first, days)
+        employees.append({
+            "user_id": user["id"],
+            "name": user.get("name"),
+            "daily": load,
+            "peak": max(load),
+            "overbooked_days": [
+                (first + timedelta(days=i)).isoformat() for i, n in enumerate(load) if n > max_concurrent
+            ]
+        })
+    
+    return {
+        "dates": [(first + timedelta(days=i)).isoformat() for i in range(days)],
+        "max_concurrent": max_concurrent,
+        "employees": employees
+    }
+
+@api_router.get("/workload/free", response_model=List[dict])
+async def get_free_employees(start: str, end: str, current_user: dict = Depends(require_admin)):
+    # Employees with no open task overlapping [start, end]
+    first, days = parse_day_range(start, end)
+    last = (first + timedelta(days=days - 1)).isoformat()
+    users = await db.users.find({"role": "employee"}, {"_id": 0, "id": 1, "name": 1, "position": 1}).sort("name", 1).to_list(1000)
+    return [user for user in users if workload_index.is_free(user["id"], first.isoformat(), last)]
+
+# ============== DELTA SYNC ==============
+#
+# Every synced document carries `updated_at` (ISO, UTC), set by the write that
+# changes it; deletes leave a tombstone. GET /api/sync?since=<until of the
+# previous call> returns what changed per collection. Each call re-reads a
+# SYNC_GRACE window before `since` (like the rollup watermark) so writes whose
+# timestamp was taken just before a sync but landed after it are never lost;
+# clients apply changes idempotently, so the overlap is harmless.
+
+SYNC_GRACE = timedelta(seconds=30)
+SYNC_TOMBSTONE_DAYS = 30
+SYNC_MAX_CHANGES = 1000
+
+# entity kind -> collection
+SYNC_KINDS = {
+    "user": "users",
+    "task": "tasks",
+    "note": "notes",
+    "client": "clients",
+    "folder": "folders",
+    "document": "documents",
+    "report": "reports",
+}
+
+async def record_tombstones(kind: str, before: Optional[dict], after: Optional[dict]):
+    collection = SYNC_KINDS.get(kind)
+    if collection is None or before is None:
+        return
+    if after is None:
+        # Admins see every tombstone; employees those of things they could see
+        if kind == "task":
+            users = list(before.get("assigned_to") or [])
+        elif kind == "report":
+            users = [before.get("user_id")]
+        elif kind == "note":
+            users = ["*"]
+        else:
+            users = []
+        admins = True
+    elif kind == "task":
+        # Taken off a task: it disappears from that employee's view only
+        users = list(set(before.get("assigned_to") or []) - set(after.get("assigned_to") or []))
+        admins = False
+        if not users:
+            return
+    else:
+        return
+    now = datetime.now(timezone.utc)
+    await db.tombstones.insert_one({
+        "collection": collection,
+        "id": before["id"],
+        "deleted_at": now.isoformat(),
+        "admins": admins,
+        "users": users,
+        "expires_at": now + timedelta(days=SYNC_TOMBSTONE_DAYS)
+    })
+
+def sync_scope(collection: str, current_user: dict) -> Optional[dict]:
+    # The filter a user's view of a collection is limited to; None if hidden
+    if current_user["role"] == "admin":
+        return {}
+    user_id = current_user["user_id"]
+    return {
+        "users": {"id": user_id},
+        "tasks": {"assigned_to": user_id},
+        "notes": {},
+        "reports": {"user_id": user_id},
+    }.get(collection)
+
+def sync_projection(collection: str, current_user: dict) -> dict:
+    if collection == "users":
+        return user_projection(current_user)
+    if collection == "documents":
+        return {"_id": 0, "file_data": 0}
+    if collection == "tasks":
+        return TASK_PROJECTION
+    return {"_id": 0}
+
+@api_router.get("/sync", response_model=dict)
+async def sync(
+    since: Optional[str] = None,
+    collections: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    # Without `since` (or with one older than the tombstones) everything the
+    # user can see is returned with "full": true and should replace local state
+    is_admin = current_user["role"] == "admin"
+    visible = [c for c in SYNC_KINDS.values() if sync_scope(c, current_user) is not None]
+    if collections:
+        requested = [c.strip() for c in collections.split(",") if c.strip()]
+        unknown = set(requested) - set(SYNC_KINDS.values())
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Colecții necunoscute: {', '.join(sorted(unknown))}")
+        if set(requested) - set(visible):
+            raise HTTPException(status_code=403, detail="Acces interzis")
+        visible = requested
+    
+    now = datetime.now(timezone.utc)
+    cutoff = None
+    if since:
+        try:
+            since_at = datetime.fromisoformat(since)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Parametrul since este invalid")
+        if since_at.tzinfo is None:
+            since_at = since_at.replace(tzinfo=timezone.utc)
+        if since_at > now - timedelta(days=SYNC_TOMBSTONE_DAYS) + SYNC_GRACE:
+            cutoff = (since_at - SYNC_GRACE).isoformat()
+    
+    async def changes(collection: str) -> dict:
+        query = dict(sync_scope(collection, current_user))
+        if cutoff:
+            query["updated_at"] = {"$gt": cutoff}
+        updated = await db[collection].find(query, sync_projection(collection, current_user)).sort(
+            "updated_at", 1
+        ).to_list(SYNC_MAX_CHANGES + 1)
+        # More than the cap: the client should reload this collection from its list endpoint
+        complete = len(updated) <= SYNC_MAX_CHANGES
+        updated = updated[:SYNC_MAX_CHANGES]
         
-        # Revenue by project type
-        revenue_by_type = {}
-        for c in clients:
-            ptype = c.get("project_type", "Altele")
-            if ptype not in revenue_by_type:
-                revenue_by_type[ptype] = 0
-            revenue_by_type[ptype] += c.get("budget", 0)
+        deleted = []
+        if cutoff:
+            tomb_query = {"collection": collection, "deleted_at": {"$gt": cutoff}}
+            if not is_admin:
+                tomb_query["users"] = {"$in": [current_user["user_id"], "*"]}
+            else:
+                tomb_query["admins"] = True
+            tombstones = await db.tombstones.find(tomb_query, {"_id": 0, "id": 1, "deleted_at": 1}).to_list(None)
+            # An id deleted and then (re)appearing later is reported as updated only
+            current = {doc["id"]: doc.get("updated_at") or "" for doc in updated}
+            gone = {
+                t["id"] for t in tombstones
+                if t["id"] not in current or current[t["id"]] < t["deleted_at"]
+            }
+            updated = [doc for doc in updated if doc["id"] not in gone]
+            deleted = sorted(gone)
         
-        return {
-            "total_employees": total_employees,
-            "total_tasks": total_tasks,
-            "pending_tasks": pending_tasks,
-            "in_progress_tasks": in_progress_tasks,
-            "completed_tasks": completed_tasks,
-            "total_clients": total_clients,
-            "active_clients": active_clients,
-            "total_budget": total_budget,
-            "monthly_revenue": monthly_revenue,
-            "employees": employees,
-            "recent_tasks": recent_tasks,
-            "revenue_by_type": revenue_by_type
-        }
+        if collection == "tasks":
+            await hydrate_assignees(updated, user_projection(current_user))
+        return {"updated": updated, "deleted": deleted, "complete": complete}
+    
+    results = await asyncio.gather(*(changes(c) for c in visible))
+    return {
+        # "Z" rather than "+00:00" so the value survives an unencoded query string
+        "until": now.isoformat().replace("+00:00", "Z"),
+        "full": cutoff is None,
+        "collections": dict(zip(visible, results))
+    }
+
+# ============== BATCH ==============
+
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', '20'))
+# Never dispatched from a batch: nesting, and the never-ending event stream
+BATCH_EXCLUDED_PATHS = {"/api/batch", "/api/events"}
+
+class BatchScope:
+    # Shared by the sub-requests of one /api/batch call: the decoded token
+    # and a snapshot of the user directory, loaded at most once
+    def __init__(self, token: str, user: dict):
+        self.token = token
+        self.user = user
+        self._directory = None
+
+    def directory(self) -> "asyncio.Future":
+        if self._directory is None:
+            self._directory = asyncio.ensure_future(self._load_directory())
+        return self._directory
+
+    async def _load_directory(self) -> dict:
+        return {user["id"]: user async for user in db.users.find({}, {"_id": 0, "password_hash": 0})}
+
+batch_scope: ContextVar[Optional[BatchScope]] = ContextVar("batch_scope", default=None)
+
+class BatchItem(BaseModel):
+    id: Optional[str] = None
+    path: str
+    headers: Dict[str, str] = {}
+
+class BatchRequest(BaseModel):
+    requests: List[BatchItem]
+
+BATCH_RESPONSE_HEADERS = ("etag", "x-next-cursor")
+
+async def run_batch_item(request: Request, item: BatchItem) -> dict:
+    path, _, query = item.path.partition("?")
+    if not path.startswith("/api/") or path.rstrip("/") in BATCH_EXCLUDED_PATHS:
+        return {"id": item.id, "status": 400, "headers": {}, "body": {"detail": "Cale invalidă în batch"}}
+    
+    headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in item.headers.items()
+               if k.lower() not in ("authorization", "host", "content-length")]
+    headers.append((b"authorization", request.headers["authorization"].encode("latin-1")))
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": request.scope.get("http_version", "1.1"),
+        "method": "GET",
+        "scheme": request.url.scheme,
+        "server": request.scope.get("server"),
+        "client": request.scope.get("client"),
+        "root_path": "",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": query.encode("latin-1"),
+        "headers": headers,
+        "app": request.scope.get("app"),
+        # So HTTPException inside the route still becomes a normal response
+        "starlette.exception_handlers": request.scope.get("starlette.exception_handlers"),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    try:
+        await app.router(scope, receive, send)
+    except Exception:
+        logger.exception("Batch sub-request failed: %s", item.path)
+        return {"id": item.id, "status": 500, "headers": {}, "body": {"detail": "Eroare internă"}}
+    
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    response_headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in start.get("headers", [])}
+    raw = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    if response_headers.get("content-type", "").startswith("application/json") and raw:
+        body = json.loads(raw)
     else:
-        # Employee stats
-        my_tasks = await db.tasks.count_documents({"assigned_to": current_user["user_id"]})
-        my_pending = await db.tasks.count_documents({"assigned_to": current_user["user_id"], "status": "pending"})
-        my_in_progress = await db.tasks.count_documents({"assigned_to": current_user["user_id"], "status": "in_progress"})
-        my_completed = await db.tasks.count_documents({"assigned_to": current_user["user_id"], "status": "completed"})
-        
-        return {
-            "my_tasks": my_tasks,
-            "my_pending": my_pending,
-            "my_in_progress": my_in_progress,
-            "my_completed": my_completed
-        }
+        body = raw.decode("utf-8", errors="replace") or None
+    return {
+        "id": item.id,
+        "status": start["status"],
+        "headers": {k: response_headers[k] for k in BATCH_RESPONSE_HEADERS if k in response_headers},
+        "body": body
+    }
+
+@api_router.post("/batch", response_model=dict)
+async def batch(payload: BatchRequest, request: Request,
+                credentials: HTTPAuthorizationCredentials = Depends(security),
+                current_user: dict = Depends(get_current_user)):
+    # Several independent GETs in one round trip. The sub-requests run
+    # concurrently through the app's own routes, so results are identical to
+    # separate calls; only GET is supported because there is no ordering.
+    if not payload.requests:
+        return {"responses": []}
+    if len(payload.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=400, detail=f"Prea multe cereri într-un batch (maxim {BATCH_MAX_REQUESTS})")
+    
+    token = batch_scope.set(BatchScope(credentials.credentials, current_user))
+    try:
+        # gather copies the context into each sub-request's task
+        responses = await asyncio.gather(*(run_batch_item(request, item) for item in payload.requests))
+    finally:
+        batch_scope.reset(token)
+    return {"responses": list(responses)}
+
+# ============== BOOTSTRAP ==============
+
+@api_router.get("/bootstrap", response_model=BootstrapOut)
+async def bootstrap(request: Request, response: Response, current_user: dict = Depends(get_current_user)):
+    # The SPA's initial state in one round trip: the token is decoded once,
+    # the queries run concurrently and task assignees are hydrated from the
+    # user directory already in hand instead of a second lookup
+    not_modified = await revision_guard(request, response, current_user, "user", "task", "client", "stats")
+    if not_modified:
+        return not_modified
+    user_id = current_user["user_id"]
+    projection = user_projection(current_user)
+    
+    if current_user["role"] == "admin":
+        users, stats, tasks, clients = await asyncio.gather(
+            db.users.find({}, projection).to_list(1000),
+            dashboard_stats(current_user),
+            db.tasks.find({}, TASK_PROJECTION).to_list(1000),
+            db.clients.find({}, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).to_list(1000)
+        )
+        directory = {user["id"]: user for user in users}
+        me = directory.get(user_id)
+    else:
+        me, stats, tasks = await asyncio.gather(
+            db.users.find_one({"id": user_id}, projection),
+            dashboard_stats(current_user),
+            db.tasks.find({"assigned_to": user_id}, TASK_PROJECTION).to_list(1000)
+        )
+        directory = await load_users((uid for task in tasks for uid in task.get("assigned_to") or []), projection)
+    if not me:
+        raise HTTPException(status_code=404, detail="Utilizator negăsit")
+    
+    for task in tasks:
+        task["assignees"] = [directory[uid] for uid in task.get("assigned_to") or [] if uid in directory]
+    
+    payload = {"user": me, "stats": stats, "tasks": tasks}
+    if current_user["role"] == "admin":
+        payload["users"] = users
+        payload["clients"] = clients
+    return trusted_json(payload, response)
+
+# ============== METRICS ROUTE ==============
+
+def metric_labels(**labels) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for name, value in labels.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{name}="{value}"')
+    return "{" + ",".join(parts) + "}"
+
+def render_histogram(lines: list, name: str, histogram: Histogram, **labels):
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{metric_labels(**labels, le=bound)} {cumulative}")
+    cumulative += histogram.counts[-1]
+    lines.append(f"{name}_bucket{metric_labels(**labels, le='+Inf')} {cumulative}")
+    lines.append(f"{name}_sum{metric_labels(**labels)} {histogram.sum}")
+    lines.append(f"{name}_count{metric_labels(**labels)} {cumulative}")
+
+def render_metrics() -> str:
+    lines = []
+    
+    def metric(name: str, kind: str, help_text: str):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+    
+    metric("http_requests_total", "counter", "HTTP requests by method, route template and status")
+    for (method, route, status_code), count in sorted(request_metrics.counts.items()):
+        lines.append(f"http_requests_total{metric_labels(method=method, route=route, status=status_code)} {count}")
+    metric("http_requests_in_flight", "gauge", "HTTP requests being served, including open event streams")
+    lines.append(f"http_requests_in_flight {request_metrics.in_flight}")
+    metric("http_request_duration_seconds", "histogram", "HTTP request latency by method and route template")
+    for (method, route), histogram in sorted(request_metrics.latency.items()):
+        render_histogram(lines, "http_request_duration_seconds", histogram, method=method, route=route)
+    
+    with mongo_command_metrics._lock:
+        commands = {name: (list(h.counts), h.sum) for name, h in mongo_command_metrics.latency.items()}
+        failures = dict(mongo_command_metrics.failures)
+    metric("mongodb_command_duration_seconds", "histogram", "MongoDB command latency by command name")
+    for name, (counts, total) in sorted(commands.items()):
+        snapshot = Histogram()
+        snapshot.counts, snapshot.sum = counts, total
+        render_histogram(lines, "mongodb_command_duration_seconds", snapshot, command=name)
+    metric("mongodb_command_failures_total", "counter", "Failed MongoDB commands by command name")
+    for name, count in sorted(failures.items()):
+        lines.append(f"mongodb_command_failures_total{metric_labels(command=name)} {count}")
+    
+    pool = mongo_pool_metrics
+    metric("mongodb_pool_connections", "gauge", "Open connections in the MongoDB pool")
+    lines.append(f"mongodb_pool_connections {pool.open}")
+    metric("mongodb_pool_checked_out", "gauge", "MongoDB connections in use")
+    lines.append(f"mongodb_pool_checked_out {pool.checked_out}")
+    metric("mongodb_pool_waiting", "gauge", "Operations waiting for a MongoDB connection")
+    lines.append(f"mongodb_pool_waiting {pool.waiting}")
+    metric("mongodb_pool_checkout_failures_total", "counter", "Failed MongoDB connection checkouts")
+    lines.append(f"mongodb_pool_checkout_failures_total {pool.checkout_failures}")
+    metric("mongodb_pool_cleared_total", "counter", "Times the MongoDB pool was cleared")
+    lines.append(f"mongodb_pool_cleared_total {pool.cleared}")
+    
+    metric("bcrypt_pool_workers", "gauge", "Threads hashing passwords")
+    lines.append(f"bcrypt_pool_workers {BCRYPT_WORKERS}")
+    metric("bcrypt_pool_pending", "gauge", "Password hashes queued or running")
+    lines.append(f"bcrypt_pool_pending {request_metrics.bcrypt_pending}")
+    
+    metric("cache_hits_total", "counter", "In-process cache hits")
+    lines.append(f"cache_hits_total{metric_labels(cache='dashboard')} {dashboard_cache.hits}")
+    metric("cache_misses_total", "counter", "In-process cache misses")
+    lines.append(f"cache_misses_total{metric_labels(cache='dashboard')} {dashboard_cache.misses}")
+    metric("cache_hit_ratio", "gauge", "Hits over lookups since start")
+    lookups = dashboard_cache.hits + dashboard_cache.misses
+    lines.append(f"cache_hit_ratio{metric_labels(cache='dashboard')} {dashboard_cache.hits / lookups if lookups else 0}")
+    
+    metric("invalidation_messages_received_total", "counter", "Changes replayed from other workers")
+    lines.append(f"invalidation_messages_received_total {invalidation_bus.received}")
+    metric("invalidation_lag_seconds", "gauge", "Publish-to-replay delay of the last replayed change")
+    lines.append(f"invalidation_lag_seconds {invalidation_bus.last_lag or 0}")
+    metric("event_stream_subscribers", "gauge", "Open server-sent event streams")
+    lines.append(f"event_stream_subscribers {len(event_bus)}")
+    return "\n".join(lines) + "\n"
+
+async def require_metrics_access(credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security)):
+    token = credentials.credentials if credentials else None
+    if METRICS_TOKEN and token and hmac.compare_digest(token, METRICS_TOKEN):
+        return
+    current_user = await require_admin(decode_token(token))
+    # The token's role claim outlives a demotion or deletion; check the stored account
+    if not await db.users.find_one({"id": current_user["user_id"], "role": "admin"}, {"_id": 1}):
+        raise HTTPException(status_code=403, detail="Acces interzis. Doar administratorii pot efectua această acțiune.")
+
+@api_router.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_metrics_access)])
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 # ============== HEALTH CHECK ==============
 
@@ -850,14 +3598,211 @@ async def health():
 # Include the router in the main app
 app.include_router(api_router)
 
+# ============== COMPRESSION ==============
+
+COMPRESSION_MIN_BYTES = int(os.environ.get('COMPRESSION_MIN_BYTES', '1024'))
+# Each compressed piece is sent as it is produced, so a large body never has
+# a full compressed copy next to it
+COMPRESSION_CHUNK_BYTES = 64 * 1024
+# Dynamic content: the cheap levels keep almost all of the size win
+BROTLI_QUALITY = 4
+GZIP_LEVEL = 6
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+# Server-sent events must reach the client as they are written
+STREAMED_TYPES = ("text/event-stream",)
+# Document types that are compressed already; their base64 download is
+# left alone (Brotli or gzip would spend CPU for a few percent)
+PRECOMPRESSED_FILE_TYPES = (
+    "image/", "video/", "audio/", "application/pdf", "application/zip", "application/gzip",
+    "application/x-7z", "application/x-rar", "application/vnd.openxmlformats",
+)
+
+def is_precompressed(file_type: Optional[str]) -> bool:
+    file_type = (file_type or "").lower()
+    return file_type != "image/svg+xml" and file_type.startswith(PRECOMPRESSED_FILE_TYPES)
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    weights = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.partition(";")
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[name.strip()] = weight
+    # Highest q wins; on a tie Brotli, the smaller output
+    supported = ("br", "gzip") if brotli else ("gzip",)
+    best = max(supported, key=lambda enc: (weights.get(enc, weights.get("*", 0)), enc == "br"))
+    return best if weights.get(best, weights.get("*", 0)) > 0 else None
+
+class StreamEncoder:
+    def __init__(self, encoding: str):
+        if encoding == "br":
+            compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+            self.compress, self.finish = compressor.process, compressor.finish
+        else:
+            compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+            self.compress, self.finish = compressor.compress, compressor.flush
+
+class CompressionMiddleware:
+    # Brotli/gzip, chunk by chunk as the body is sent. Small bodies, encoded
+    # ones, event streams and routes that set request.state.compress = False
+    # (precompressed documents) pass through.
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        
+        start = None
+        pending = []
+        pending_size = 0
+        encoder = None
+        passthrough = False
+        
+        async def send_compressed(body: bytes, more_body: bool):
+            view = memoryview(body)
+            for offset in range(0, len(view), COMPRESSION_CHUNK_BYTES):
+                piece = encoder.compress(view[offset:offset + COMPRESSION_CHUNK_BYTES])
+                if piece:
+                    await send({"type": "http.response.body", "body": piece, "more_body": True})
+            if not more_body:
+                await send({"type": "http.response.body", "body": encoder.finish(), "more_body": False})
+        
+        async def compressing_send(message):
+            nonlocal start, pending_size, encoder, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                status_code = message["status"]
+                if (status_code < 200 or status_code in (204, 304) or "content-encoding" in headers
+                        or not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or content_type.startswith(STREAMED_TYPES)
+                        or scope.get("state", {}).get("compress") is False):
+                    passthrough = True
+                    await send(message)
+                    return
+                MutableHeaders(raw=message["headers"]).add_vary_header("Accept-Encoding")
+                start = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if encoder is not None:
+                await send_compressed(body, more_body)
+                return
+            
+            pending.append(body)
+            pending_size += len(body)
+            if more_body and pending_size < self.minimum_size:
+                return  # not enough yet to decide
+            buffered = b"".join(pending)
+            pending.clear()
+            if not more_body and pending_size < self.minimum_size:
+                passthrough = True
+                await send(start)
+                await send({"type": "http.response.body", "body": buffered, "more_body": False})
+                return
+            
+            headers = MutableHeaders(raw=start["headers"])
+            del headers["content-length"]
+            headers["content-encoding"] = encoding
+            encoder = StreamEncoder(encoding)
+            await send(start)
+            await send_compressed(buffered, more_body)
+        
+        await self.app(scope, receive, compressing_send)
+
+class MetricsMiddleware:
+    # Counts and times requests by method, route template and status;
+    # unmatched requests share one label so random URLs can't grow the set
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+        
+        async def recording_send(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+        
+        request_metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, recording_send)
+        finally:
+            request_metrics.in_flight -= 1
+            route = scope.get("route")
+            request_metrics.observe(scope["method"], route.path if route else "unmatched", status_code,
+                                    time.perf_counter() - started)
+
+app.add_middleware(CompressionMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_credentials=True,
     allow_origins=os.environ.get('CORS_ORIGINS', '*').split(','),
     allow_methods=["*"],
     allow_headers=["*"],
+    # The query log headers are added outside this middleware but still need exposing
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified", *(["X-Query-Count", "X-Queries"] if QUERY_DEBUG else [])],
 )
 
+class QueryLogMiddleware:
+    # QUERY_DEBUG only: puts the request's Mongo commands in the response
+    # headers. Commands issued after the response started (streams) only
+    # count towards the logged budget.
+    def __init__(self, app, budget: int = QUERY_BUDGET):
+        self.app = app
+        self.budget = budget
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        queries = []
+        
+        async def send_with_queries(message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-Query-Count"] = str(len(queries))
+                headers["X-Queries"] = ",".join(queries)
+            await send(message)
+        
+        token = request_queries.set(queries)
+        try:
+            await self.app(scope, receive, send_with_queries)
+        finally:
+            request_queries.reset(token)
+            if len(queries) > self.budget:
+                logger.warning("%s %s issued %d Mongo commands (budget %d): %s",
+                               scope["method"], scope["path"], len(queries), self.budget, ", ".join(queries))
+
+if QUERY_DEBUG:
+    app.add_middleware(QueryLogMiddleware)
+# Outermost, so the latency includes compression and CORS
+app.add_middleware(MetricsMiddleware)
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -865,6 +3810,105 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+async def ensure_indexes():
+    indexes = [
+        (db.users, [("id", 1)], {"unique": True}),
+        (db.users, [("role", 1)], {}),
+        (db.users, [("name", 1)], {}),
+        (db.tasks, [("id", 1)], {"unique": True}),
+        (db.tasks, [("status", 1)], {}),
+        (db.tasks, [("created_at", -1)], {}),
+        (db.tasks, [("completed_at", 1)], {"sparse": True}),
+        (db.tasks, [("status", 1), ("completed_at", -1)], {}),
+        (db.reports, [("created_at", 1)], {}),
+        (db.tasks, [("assigned_to", 1), ("status", 1)], {}),
+        (db.tasks, [("status", 1), ("priority_rank", 1), ("due_sort", 1), ("id", 1)], {}),
+        (db.clients, [("id", 1)], {"unique": True}),
+        (db.clients, [("created_at", -1), ("id", -1)], {}),
+        (db.clients, [("budget", -1), ("id", -1)], {}),
+        (db.clients, [("company_name", 1), ("id", 1)], {"collation": NAME_COLLATION}),
+        (db.clients, [("status", 1), ("created_at", -1), ("id", -1)], {}),
+        (db.clients, [("status", 1), ("budget", -1), ("id", -1)], {}),
+        (db.clients, [("status", 1), ("company_name", 1), ("id", 1)], {"collation": NAME_COLLATION}),
+        (db.clients, [("project_type", 1), ("created_at", -1), ("id", -1)], {}),
+        (db.notes, [("id", 1)], {"unique": True}),
+        (db.notes, [("created_at", -1), ("id", -1)], {}),
+        (db.notes, [("color", 1), ("created_at", -1), ("id", -1)], {}),
+        (db.notes, [("created_by", 1), ("created_at", -1), ("id", -1)], {}),
+        (db.notes, [("title", "text"), ("content", "text")],
+         {"name": "notes_text", "default_language": "romanian", "weights": {"title": 3, "content": 1}}),
+        (db.reports, [("content", "text")], {"name": "reports_text", "default_language": "romanian"}),
+        (db.tasks, [("title", "text"), ("description", "text")],
+         {"name": "tasks_text", "default_language": "romanian", "weights": {"title": 3, "description": 1}}),
+        (db.task_history, [("task_id", 1), ("at", 1)], {}),
+        (db.tasks, [("due_date", 1)], {}),
+        (db.notifications, [("user_id", 1), ("task_id", 1), ("type", 1), ("due_date", 1)], {"unique": True}),
+        (db.notifications, [("user_id", 1), ("created_at", -1), ("id", -1)], {}),
+        (db.notifications, [("user_id", 1), ("read", 1)], {}),
+        (db.reports, [("id", 1)], {"unique": True}),
+        *[(db[c], [("updated_at", 1)], {}) for c in SYNC_KINDS.values()],
+        (db.tasks, [("assigned_to", 1), ("updated_at", 1)], {}),
+        (db.reports, [("user_id", 1), ("updated_at", 1)], {}),
+        (db.tombstones, [("collection", 1), ("deleted_at", 1)], {}),
+        (db.tombstones, [("expires_at", 1)], {"expireAfterSeconds": 0}),
+        (db.reports, [("user_id", 1), ("date", -1)], {"unique": True}),
+        (db.reports, [("date", -1)], {}),
+        (db.folders, [("id", 1)], {"unique": True}),
+        (db.folders, [("client_id", 1)], {}),
+        (db.documents, [("id", 1)], {"unique": True}),
+        (db.documents, [("folder_id", 1)], {}),
+    ]
+    for collection, keys, options in indexes:
+        try:
+            await collection.create_index(keys, **options)
+        except Exception:
+            logger.exception("Could not create index %s on %s", keys, collection.name)
+
+background_tasks = []
+
+async def rebuild_memory_indexes():
+    global autocomplete_index, client_name_index, workload_index
+    changes = []
+    index_change_buffers.append(changes)
+    try:
+        indexes = await asyncio.gather(
+            build_autocomplete_index(), build_client_name_index(), build_workload_index()
+        )
+    finally:
+        index_change_buffers.remove(changes)
+    # Writes applied while the builds read Mongo may be missing from them.
+    # Every apply replaces the whole entry, so replaying in order is safe even
+    # where a build already saw the change; no await until the swap
+    for kind, before, after in changes:
+        apply_index_change(indexes, kind, before, after)
+    autocomplete_index, client_name_index, workload_index = indexes
+
+@app.on_event("startup")
+async def startup_tasks():
+    await ensure_indexes()
+    # Tasks written before the board sort keys were stored
+    await db.tasks.update_many({"priority_rank": {"$exists": False}}, [board_sort_stage()])
+    # Reports written before versioning start at version 0
+    await db.reports.update_many({"version": {"$exists": False}}, {"$set": {"version": 0}})
+    # Documents written before delta sync count as changed when they were created
+    for collection in SYNC_KINDS.values():
+        await db[collection].update_many(
+            {"updated_at": {"$exists": False}}, [{"$set": {"updated_at": "$created_at"}}]
+        )
+    await invalidation_bus.prepare()
+    await revisions.load()
+    await rebuild_stats()
+    await rebuild_memory_indexes()
+    invalidation_bus.start()
+    await reminder_scheduler.start()
+    background_tasks.append(asyncio.create_task(reconcile_stats_periodically()))
+    background_tasks.append(asyncio.create_task(update_rollups_periodically()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    for task in background_tasks:
+        task.cancel()
+    await reminder_scheduler.stop()
+    await invalidation_bus.stop()
     client.close()
+    bcrypt_executor.shutdown(wait=False)
@@ -0,0 +1,131 @@
+import asyncio
+import base64
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+import argparse
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+import orjson
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+from server import CompressionMiddleware, is_precompressed  # noqa: E402
+
+WORDS = ("client", "proiect", "factură", "întâlnire", "raport", "sarcină", "actualizare", "termen", "buget",
+         "echipă", "implementare", "testare", "documentație", "server", "bază", "date", "integrare", "plăți")
+
+
+class CompressionBenchmark:
+    """Runs realistic API bodies through CompressionMiddleware the way the
+    app sends them and reports bytes on the wire and CPU time per response
+    for identity, gzip and Brotli.
+
+    Payloads: GET /api/tasks (1000 tasks), GET /api/reports with full
+    content, GET /api/users with inline avatars and a PDF document download.
+    The PDF is shown twice: as served (skipped) and force-compressed, to
+    show what the skip saves.
+    """
+
+    def __init__(self, seed=7):
+        self.random = random.Random(seed)
+
+    def text(self, words):
+        return " ".join(self.random.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+    def opaque(self, size):
+        # Stands in for PNG/PDF bytes: already compressed, so no redundancy
+        return "data:application/octet-stream;base64," + base64.b64encode(os.urandom(size)).decode("ascii")
+
+    def payloads(self):
+        now = datetime.now(timezone.utc)
+        users = [{
+            "id": str(uuid.uuid4()), "email": f"angajat{i}@firma.ro", "name": f"Angajat {i}",
+            "phone": "+40 721 000 000", "role": "employee", "position": "Dezvoltator",
+            "avatar": self.opaque(self.random.randint(8, 30) * 1024),
+            "created_at": (now - timedelta(days=i)).isoformat(), "updated_at": now.isoformat()
+        } for i in range(40)]
+        slim = [{k: v for k, v in user.items() if k != "avatar"} for user in users]
+        tasks = [{
+            "id": str(uuid.uuid4()), "title": self.text(6), "description": self.text(40),
+            "start_date": (now - timedelta(hours=i)).date().isoformat(),
+            "due_date": (now + timedelta(days=i % 30)).date().isoformat(),
+            "priority": ("low", "medium", "high")[i % 3], "status": ("pending", "in_progress", "completed")[i % 3],
+            "assigned_to": [slim[i % 40]["id"], slim[(i + 1) % 40]["id"]], "created_by": slim[0]["id"],
+            "created_at": (now - timedelta(hours=i)).isoformat(), "updated_at": now.isoformat(),
+            "assignees": [slim[i % 40], slim[(i + 1) % 40]]
+        } for i in range(1000)]
+        reports = [{
+            "id": str(uuid.uuid4()), "user_id": slim[i % 40]["id"], "date": (now - timedelta(days=i)).date().isoformat(),
+            "content": "\n".join(self.text(25) for _ in range(12)), "version": 3,
+            "created_at": now.isoformat(), "updated_at": now.isoformat(), "user": slim[i % 40]
+        } for i in range(300)]
+        document = {
+            "id": str(uuid.uuid4()), "name": "contract.pdf", "file_type": "application/pdf",
+            "file_data": self.opaque(1024 * 1024), "folder_id": str(uuid.uuid4()), "created_at": now.isoformat()
+        }
+        return [
+            ("tasks x1000", tasks, True),
+            ("reports x300 (full)", reports, True),
+            ("users x40 (avatars)", users, True),
+            ("document (pdf, as served)", document, not is_precompressed(document["file_type"])),
+            ("document (pdf, forced)", document, True),
+        ]
+
+    async def send_once(self, body, encoding, compress):
+        async def app(scope, receive, send):
+            await send({"type": "http.response.start", "status": 200,
+                        "headers": [(b"content-type", b"application/json"),
+                                    (b"content-length", str(len(body)).encode())]})
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        sent = 0
+
+        async def send(message):
+            nonlocal sent
+            if message["type"] == "http.response.body":
+                sent += len(message.get("body", b""))
+
+        scope = {"type": "http", "method": "GET", "path": "/", "headers": [(b"accept-encoding", encoding.encode())],
+                 "state": {} if compress else {"compress": False}}
+        await CompressionMiddleware(app)(scope, receive, send)
+        return sent
+
+    def measure(self, body, encoding, compress, rounds):
+        sent = asyncio.run(self.send_once(body, encoding, compress))
+        samples = []
+        for _ in range(rounds):
+            start = time.process_time()
+            asyncio.run(self.send_once(body, encoding, compress))
+            samples.append(time.process_time() - start)
+        return sent, statistics.median(samples)
+
+    def run(self, rounds):
+        print(f"📦 {rounds} rounds per case; CPU is process time per response")
+        print(f"   {'payload':28s} {'encoding':9s} {'bytes':>11s} {'saved':>7s} {'cpu':>10s}")
+        for name, payload, compress in self.payloads():
+            body = orjson.dumps(payload)
+            for encoding in ("identity", "gzip", "br"):
+                sent, cpu = self.measure(body, encoding, compress, rounds)
+                saved = 1 - sent / len(body)
+                print(f"   {name:28s} {encoding:9s} {sent:11,d} {saved:7.1%} {cpu * 1000:8.2f} ms")
+        return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark response compression on realistic payloads")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+    return 0 if CompressionBenchmark().run(args.rounds) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
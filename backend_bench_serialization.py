@@ -0,0 +1,107 @@
+import asyncio
+import statistics
+import sys
+import time
+import uuid
+import argparse
+from datetime import datetime, timezone, timedelta
+from typing import List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+
+class SerializationBenchmark:
+    """Times how long the API spends turning a GET /api/tasks payload into
+    response bytes, without Mongo or the network in the way.
+
+    before: response_model=List[dict] (validate + serialize) and the stdlib
+            json JSONResponse, which is what every route used to do
+    after:  trusted_json, i.e. ORJSONResponse straight from the documents
+    """
+
+    def __init__(self, tasks=1000, assignees=2):
+        self.payload = self.build_payload(tasks, assignees)
+        self.list_field = create_response_field(name="Response", type_=List[dict])
+
+    def build_payload(self, count, per_task):
+        now = datetime.now(timezone.utc)
+        users = [{
+            "id": str(uuid.uuid4()),
+            "email": f"angajat{i}@firma.ro",
+            "name": f"Angajat Ștefănescu {i}",
+            "phone": "+40 721 000 000",
+            "role": "employee",
+            "position": "Dezvoltator",
+            "avatar": None,
+            "created_at": (now - timedelta(days=400)).isoformat(),
+            "updated_at": (now - timedelta(days=3)).isoformat()
+        } for i in range(20)]
+        tasks = []
+        for i in range(count):
+            assignees = [users[(i + j) % len(users)] for j in range(per_task)]
+            created = now - timedelta(hours=i)
+            tasks.append({
+                "id": str(uuid.uuid4()),
+                "title": f"Sarcină {i}: actualizare modul facturare",
+                "description": "Verificați integrarea cu procesatorul de plăți și actualizați documentația. " * 3,
+                "start_date": created.date().isoformat(),
+                "due_date": (created + timedelta(days=7)).date().isoformat(),
+                "priority": ("low", "medium", "high")[i % 3],
+                "status": ("pending", "in_progress", "completed")[i % 3],
+                "assigned_to": [user["id"] for user in assignees],
+                "created_by": users[0]["id"],
+                "created_at": created.isoformat(),
+                "updated_at": created.isoformat(),
+                "completed_at": created.isoformat() if i % 3 == 2 else None,
+                "started_at": created.isoformat() if i % 3 else None,
+                "status_changed_at": created.isoformat(),
+                "assignees": assignees
+            })
+        return tasks
+
+    async def before(self):
+        content = await serialize_response(field=self.list_field, response_content=self.payload)
+        return JSONResponse(content).body
+
+    async def after(self):
+        return ORJSONResponse(self.payload).body
+
+    async def measure(self, render, rounds):
+        body = await render()  # warm-up
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            await render()
+            samples.append(time.perf_counter() - start)
+        return sorted(samples), len(body)
+
+    def run(self, rounds, min_speedup):
+        print(f"📦 {len(self.payload)} tasks, {rounds} rounds each")
+        results = {}
+        for name, render in (("before", self.before), ("after", self.after)):
+            samples, size = asyncio.run(self.measure(render, rounds))
+            p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+            results[name] = statistics.median(samples)
+            print(f"   {name:7s} median={results[name] * 1000:7.2f} ms  p95={p95 * 1000:7.2f} ms  "
+                  f"body={size / 1024:7.1f} KiB")
+        speedup = results["before"] / results["after"]
+        passed = speedup >= min_speedup
+        print(f"{'✅' if passed else '❌'} {speedup:.1f}x faster (minimum {min_speedup:.1f}x)")
+        return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /api/tasks response serialization")
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--min-speedup", type=float, default=2.0, help="the benchmark fails below this")
+    args = parser.parse_args()
+
+    benchmark = SerializationBenchmark(tasks=args.tasks)
+    return 0 if benchmark.run(args.rounds, args.min_speedup) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
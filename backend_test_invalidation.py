@@ -0,0 +1,178 @@
+import requests
+import subprocess
+import statistics
+import sys
+import time
+import uuid
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = Path(__file__).parent / "backend"
+
+
+class InvalidationLagTester:
+    """Starts several single-process API workers on the same MongoDB (the
+    MONGO_URL / DB_NAME in backend/.env), writes through one of them and
+    measures how long the others take to serve the change.
+
+    Two things are timed on every other worker after a client is created:
+      - autocomplete: the in-memory prefix index picks up the new client
+      - dashboard:    the cached admin stats show the new client count
+    Without the invalidation bus the first never happens and the second
+    waits for DASHBOARD_CACHE_SECONDS.
+    """
+
+    def __init__(self, workers=3, base_port=8100, email="admin@lagtest.local", password="lagtest"):
+        self.ports = [base_port + i for i in range(workers)]
+        self.email = email
+        self.password = password
+        self.processes = []
+        self.token = None
+        self.lags = {"autocomplete": [], "dashboard": []}
+        self.timeouts = 0
+
+    def url(self, port, endpoint):
+        return f"http://127.0.0.1:{port}/api/{endpoint}"
+
+    @property
+    def headers(self):
+        return {"Authorization": f"Bearer {self.token}"}
+
+    def start_workers(self):
+        print(f"🚀 Starting {len(self.ports)} workers on ports {self.ports}")
+        for port in self.ports:
+            self.processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port), "--log-level", "warning"],
+                cwd=BACKEND_DIR
+            ))
+        deadline = time.time() + 60
+        for port in self.ports:
+            while True:
+                try:
+                    if requests.get(self.url(port, ""), timeout=1).status_code == 200:
+                        break
+                except requests.RequestException:
+                    pass
+                if time.time() > deadline:
+                    raise RuntimeError(f"Worker on port {port} did not start")
+                time.sleep(0.2)
+        print("✅ All workers up")
+
+    def stop_workers(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    def login(self):
+        port = self.ports[0]
+        credentials = {"email": self.email, "password": self.password}
+        response = requests.post(self.url(port, "auth/login"), json=credentials)
+        if response.status_code != 200:
+            # Fresh database: the first admin can register themselves
+            requests.post(self.url(port, "auth/register"), json={**credentials, "name": "Lag Test"})
+            response = requests.post(self.url(port, "auth/login"), json=credentials)
+        if response.status_code != 200:
+            raise RuntimeError(f"Login failed: {response.text[:200]}")
+        self.token = response.json()["token"]
+        print("✅ Logged in as admin")
+
+    def total_clients(self, port):
+        return requests.get(self.url(port, "dashboard/stats"), headers=self.headers).json()["total_clients"]
+
+    def wait_for(self, check, timeout):
+        start = time.perf_counter()
+        while time.perf_counter() - start < timeout:
+            if check():
+                return time.perf_counter() - start
+            time.sleep(0.005)
+        return None
+
+    def measure_worker(self, port, name, expected_total, written_at, timeout):
+        def in_autocomplete():
+            response = requests.get(self.url(port, "autocomplete"), params={"q": name, "types": "clients"},
+                                    headers=self.headers)
+            return any(item["label"] == name for item in response.json())
+
+        results = {}
+        for metric, check in (("autocomplete", in_autocomplete),
+                              ("dashboard", lambda: self.total_clients(port) >= expected_total)):
+            waited = self.wait_for(check, timeout)
+            results[metric] = None if waited is None else time.perf_counter() - written_at
+        return results
+
+    def run_round(self, timeout):
+        writer, readers = self.ports[0], self.ports[1:]
+        # Warm every reader's dashboard cache so a stale value would be served
+        before = max(self.total_clients(port) for port in self.ports)
+        name = f"Lag Test {uuid.uuid4().hex[:8]}"
+
+        written_at = time.perf_counter()
+        response = requests.post(self.url(writer, "clients"), headers=self.headers,
+                                 json={"company_name": name, "project_type": "Web", "budget": 0})
+        client_id = response.json()["client_id"]
+
+        with ThreadPoolExecutor(max_workers=len(readers)) as pool:
+            results = list(pool.map(
+                lambda port: self.measure_worker(port, name, before + 1, written_at, timeout), readers
+            ))
+        for result in results:
+            for metric, lag in result.items():
+                if lag is None:
+                    self.timeouts += 1
+                else:
+                    self.lags[metric].append(lag)
+
+        requests.delete(self.url(writer, f"clients/{client_id}"), headers=self.headers)
+
+    def print_summary(self, max_p95):
+        print("\n" + "=" * 60)
+        print("⏱️  INVALIDATION LAG (write on worker 0 → visible on the others)")
+        print("=" * 60)
+        passed = self.timeouts == 0
+        for metric, lags in self.lags.items():
+            if not lags:
+                print(f"❌ {metric}: no samples")
+                passed = False
+                continue
+            lags = sorted(lags)
+            p95 = lags[min(len(lags) - 1, int(len(lags) * 0.95))]
+            print(f"   {metric:12s} n={len(lags):3d}  min={lags[0] * 1000:7.1f} ms  "
+                  f"median={statistics.median(lags) * 1000:7.1f} ms  p95={p95 * 1000:7.1f} ms  "
+                  f"max={lags[-1] * 1000:7.1f} ms")
+            passed = passed and p95 <= max_p95
+        if self.timeouts:
+            print(f"❌ {self.timeouts} checks never saw the change")
+        print(f"{'✅' if passed else '❌'} p95 limit {max_p95 * 1000:.0f} ms")
+        return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cross-worker invalidation lag")
+    parser.add_argument("--workers", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--base-port", type=int, default=8100)
+    parser.add_argument("--timeout", type=float, default=15.0, help="seconds to wait for one change")
+    parser.add_argument("--max-p95", type=float, default=1.0, help="seconds; the test fails above this")
+    args = parser.parse_args()
+
+    tester = InvalidationLagTester(workers=max(args.workers, 2), base_port=args.base_port)
+    tester.start_workers()
+    try:
+        tester.login()
+        for i in range(args.rounds):
+            tester.run_round(args.timeout)
+            print(f"   round {i + 1}/{args.rounds} done")
+        passed = tester.print_summary(args.max_p95)
+    finally:
+        tester.stop_workers()
+
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import { useEffect, useRef } from 'react';
+import axios from 'axios';
+import { useAuth } from '../contexts/AuthContext';
+
+const API_URL = process.env.REACT_APP_BACKEND_URL;
+const RECONNECT_MS = 3000;
+
+// Listens to the server's event stream while the component is mounted.
+// `handlers` maps an event type ("task", "note", "resync", ...) to a callback
+// receiving the parsed event.
+export const useLiveEvents = (handlers) => {
+  const { token } = useAuth();
+  const handlersRef = useRef(handlers);
+  handlersRef.current = handlers;
+
+  useEffect(() => {
+    if (!token) return undefined;
+    let source = null;
+    let retry = null;
+    let stopped = false;
+
+    // EventSource can't send headers, so the session token is traded for a
+    // short-lived ticket and only the ticket goes in the query string
+    const connect = async () => {
+      try {
+        const { data } = await axios.post(`${API_URL}/api/events/ticket`);
+        if (stopped) return;
+        const current = new EventSource(`${API_URL}/api/events?ticket=${encodeURIComponent(data.ticket)}`);
+        source = current;
+        Object.keys(handlersRef.current).forEach((type) => {
+          current.addEventListener(type, (e) => handlersRef.current[type]?.(JSON.parse(e.data)));
+        });
+        // The server ended the stream (session over, role changed) or the
+        // connection dropped: a ticket can't be reused, so fetch a new one
+        const reconnect = () => {
+          if (source !== current || stopped) return;
+          current.close();
+          source = null;
+          retry = setTimeout(connect, RECONNECT_MS);
+        };
+        current.addEventListener('closed', reconnect);
+        current.onerror = reconnect;
+      } catch (error) {
+        // A 401 means the session itself is over; nothing to reconnect with
+        if (!stopped && error.response?.status !== 401) {
+          retry = setTimeout(connect, RECONNECT_MS);
+        }
+      }
+    };
+    connect();
+
+    return () => {
+      stopped = true;
+      clearTimeout(retry);
+      source?.close();
+    };
+  }, [token]);
+};
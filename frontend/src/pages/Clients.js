@@ -61,11 +61,13 @@ export const Clients = () => {
 
   useEffect(() => {
     fetchClients();
-  }, []);
+  }, [filterStatus]);
 
   const fetchClients = async () => {
     try {
-      const response = await axios.get(`${API_URL}/api/clients`);
+      const response = await axios.get(`${API_URL}/api/clients`, {
+        params: filterStatus === 'all' ? {} : { status: filterStatus }
+      });
       setClients(response.data);
     } catch (error) {
       toast.error('Eroare la încărcarea clienților');
@@ -151,13 +153,11 @@ export const Clients = () => {
     });
   };
 
-  const filteredClients = clients.filter(client => {
-    const matchesSearch = 
-      client.company_name.toLowerCase().includes(searchTerm.toLowerCase()) ||
-      client.project_type.toLowerCase().includes(searchTerm.toLowerCase());
-    const matchesStatus = filterStatus === 'all' || client.status === filterStatus;
-    return matchesSearch && matchesStatus;
-  });
+  // Status is filtered by the API; the search box still filters what was loaded
+  const filteredClients = clients.filter(client =>
+    client.company_name.toLowerCase().includes(searchTerm.toLowerCase()) ||
+    client.project_type.toLowerCase().includes(searchTerm.toLowerCase())
+  );
 
   const formatCurrency = (amount) => {
     return new Intl.NumberFormat('ro-MD', {
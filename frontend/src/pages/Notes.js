@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useAuth } from '../contexts/AuthContext';
+import { useLiveEvents } from '../hooks/use-live-events';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
@@ -29,9 +30,13 @@ const colorLabels = {
   red: 'Roșu'
 };
 
+// Matches NOTE_PREVIEW_CHARS on the server
+const NOTE_PREVIEW_CHARS = 280;
+
 export const Notes = () => {
   const { user } = useAuth();
   const [notes, setNotes] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [dialogOpen, setDialogOpen] = useState(false);
@@ -47,10 +52,13 @@ export const Notes = () => {
     fetchNotes();
   }, []);
 
-  const fetchNotes = async () => {
+  const fetchNotes = async (cursor = null) => {
     try {
-      const response = await axios.get(`${API_URL}/api/notes`);
-      setNotes(response.data);
+      const response = await axios.get(`${API_URL}/api/notes`, {
+        params: cursor ? { cursor } : {}
+      });
+      setNotes((prev) => (cursor ? [...prev, ...response.data] : response.data));
+      setNextCursor(response.headers['x-next-cursor'] || null);
     } catch (error) {
       toast.error('Eroare la încărcarea notițelor');
     } finally {
@@ -58,6 +66,43 @@ export const Notes = () => {
     }
   };
 
+  // Changes made elsewhere arrive over the event stream instead of a refetch
+  useLiveEvents({
+    note: (event) => {
+      if (event.op === 'deleted') {
+        setNotes((prev) => prev.filter((note) => note.id !== event.id));
+      } else if (event.op === 'updated') {
+        const { content, ...fields } = event.data;
+        setNotes((prev) => prev.map((note) => {
+          if (note.id !== event.id) return note;
+          const patched = { ...note, ...fields };
+          if (content !== undefined) {
+            patched.preview = content.slice(0, NOTE_PREVIEW_CHARS);
+            patched.truncated = content.length > NOTE_PREVIEW_CHARS;
+          }
+          return patched;
+        }));
+      } else {
+        // Newest first, so a new note goes on top; the creator's name is
+        // borrowed from the list since the event only carries the id
+        const { content = '', ...fields } = event.data;
+        setNotes((prev) => {
+          if (prev.some((note) => note.id === event.id)) return prev;
+          const creatorName = fields.created_by === user?.id
+            ? user.name
+            : prev.find((note) => note.created_by === fields.created_by)?.creator_name;
+          return [{
+            ...fields,
+            preview: content.slice(0, NOTE_PREVIEW_CHARS),
+            truncated: content.length > NOTE_PREVIEW_CHARS,
+            creator_name: creatorName ?? null
+          }, ...prev];
+        });
+      }
+    },
+    resync: () => fetchNotes()
+  });
+
   const handleSubmit = async (e) => {
     e.preventDefault();
     
@@ -79,14 +124,20 @@ export const Notes = () => {
     }
   };
 
-  const handleEdit = (note) => {
-    setSelectedNote(note);
-    setFormData({
-      title: note.title,
-      content: note.content,
-      color: note.color
-    });
-    setDialogOpen(true);
+  const handleEdit = async (note) => {
+    // The list only carries a preview; load the full content before editing
+    try {
+      const response = await axios.get(`${API_URL}/api/notes/${note.id}`);
+      setSelectedNote(note);
+      setFormData({
+        title: response.data.title,
+        content: response.data.content,
+        color: response.data.color
+      });
+      setDialogOpen(true);
+    } catch (error) {
+      toast.error('Eroare la încărcarea notiței');
+    }
   };
 
   const handleDelete = async () => {
@@ -113,7 +164,7 @@ export const Notes = () => {
 
   const filteredNotes = notes.filter(note =>
     note.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-    note.content.toLowerCase().includes(searchTerm.toLowerCase())
+    note.preview.toLowerCase().includes(searchTerm.toLowerCase())
   );
 
   const canEditNote = (note) => {
@@ -295,7 +346,7 @@ export const Notes = () => {
               </CardHeader>
               <CardContent>
                 <p className="text-sm text-muted-foreground whitespace-pre-wrap line-clamp-6">
-                  {note.content}
+                  {note.truncated ? `${note.preview}…` : note.preview}
                 </p>
                 <div className="flex items-center justify-between mt-4 text-xs text-muted-foreground">
                   <span>{note.creator_name}</span>
@@ -307,6 +358,14 @@ export const Notes = () => {
         </div>
       )}
 
+      {!loading && nextCursor && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={() => fetchNotes(nextCursor)} data-testid="load-more-notes">
+            Încarcă mai multe
+          </Button>
+        </div>
+      )}
+
       {/* Delete Confirmation */}
       <Dialog open={deleteDialogOpen} onOpenChange={setDeleteDialogOpen}>
         <DialogContent>
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react';
 import axios from 'axios';
 import { useAuth } from '../contexts/AuthContext';
+import { useLiveEvents } from '../hooks/use-live-events';
 import { Button } from '../components/ui/button';
 import { Input } from '../components/ui/input';
 import { Label } from '../components/ui/label';
@@ -67,6 +68,21 @@ export const Tasks = () => {
     }
   }, []);
 
+  // Changes made elsewhere arrive over the event stream instead of a refetch
+  useLiveEvents({
+    task: (event) => {
+      if (event.op === 'deleted') {
+        setTasks((prev) => prev.filter((task) => task.id !== event.id));
+      } else if (event.op === 'updated' && !('assigned_to' in event.data)) {
+        setTasks((prev) => prev.map((task) => (task.id === event.id ? { ...task, ...event.data } : task)));
+      } else {
+        // New tasks and reassignments need the hydrated assignees
+        fetchTasks();
+      }
+    },
+    resync: () => fetchTasks()
+  });
+
   const fetchTasks = async () => {
     try {
       const response = await axios.get(`${API_URL}/api/tasks`);
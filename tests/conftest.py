@@ -0,0 +1,127 @@
+"""Shared setup for the API tests.
+
+The app runs in-process against a real mongod (TEST_MONGO_URL, default
+mongodb://localhost:27017) in a throwaway database, with QUERY_DEBUG on. All
+modules share one app instance and the seed below; tests that write create
+their own documents and compare against values read back, not the seed.
+
+Without a reachable mongod every test is skipped on a developer machine, but
+the run fails when TEST_MONGO_URL or CI is set: there a missing database is a
+broken setup, not a reason to pass.
+"""
+import os
+import sys
+import uuid
+from datetime import date, timedelta
+from pathlib import Path
+
+import pytest
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+MONGO_URL = os.environ.get("TEST_MONGO_URL", "mongodb://localhost:27017")
+DB_NAME = f"api_tests_{uuid.uuid4().hex[:8]}"
+REQUIRE_MONGO = bool(os.environ.get("TEST_MONGO_URL") or os.environ.get("CI"))
+TODAY = date.today()
+
+try:
+    MONGO_VERSION = MongoClient(MONGO_URL, serverSelectionTimeoutMS=1000).server_info()["version"]
+    MONGO_ERROR = None
+except PyMongoError as error:
+    MONGO_VERSION, MONGO_ERROR = None, error
+
+# Must be in place before server.py reads its configuration
+os.environ.update({"MONGO_URL": MONGO_URL, "DB_NAME": DB_NAME, "QUERY_DEBUG": "1"})
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "backend"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import server  # noqa: E402
+
+
+def pytest_report_header(config):
+    # Query plans and command counts depend on the server version
+    if MONGO_ERROR is not None:
+        return f"mongod: none at {MONGO_URL}"
+    return f"mongod: {MONGO_VERSION} at {MONGO_URL}"
+
+
+def pytest_collection_modifyitems(config, items):
+    if MONGO_ERROR is None:
+        return
+    if REQUIRE_MONGO:
+        raise pytest.UsageError(f"no mongod at {MONGO_URL}: {MONGO_ERROR}")
+    skip = pytest.mark.skip(reason=f"no mongod at {MONGO_URL}")
+    for item in items:
+        item.add_marker(skip)
+
+
+@pytest.fixture(scope="session")
+def api():
+    with TestClient(server.app) as client:
+        yield client
+    MongoClient(MONGO_URL).drop_database(DB_NAME)
+
+
+@pytest.fixture(scope="session")
+def sync_db(api):
+    return MongoClient(MONGO_URL)[DB_NAME]
+
+
+@pytest.fixture(scope="session")
+def call(api):
+    def call(method, path, headers=None, **kwargs):
+        response = api.request(method, path, headers=headers, **kwargs)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    return call
+
+
+@pytest.fixture(scope="session")
+def seed(call):
+    def login(email, password):
+        return {"Authorization": f"Bearer {call('POST', '/api/auth/login', json={'email': email, 'password': password})['token']}"}
+
+    call("POST", "/api/auth/register", json={"email": "admin@budget.ro", "password": "parola", "name": "Admin"})
+    admin = login("admin@budget.ro", "parola")
+    employee_id = call("POST", "/api/users", admin, json={
+        "email": "angajat@budget.ro", "password": "parola", "name": "Angajat", "position": "Dezvoltator"
+    })["user_id"]
+    employee = login("angajat@budget.ro", "parola")
+
+    task_ids = [call("POST", "/api/tasks", admin, json={
+        "title": f"Factura client {i}", "description": "Verificare factura lunară",
+        "start_date": TODAY.isoformat(), "due_date": (TODAY + timedelta(days=i)).isoformat(),
+        "priority": ("low", "medium", "high")[i % 3], "assigned_to": [employee_id]
+    })["task_id"] for i in range(6)]
+    call("PUT", f"/api/tasks/{task_ids[0]}", admin, json={"status": "in_progress"})
+    call("PUT", f"/api/tasks/{task_ids[1]}", admin, json={"status": "completed"})
+
+    client_ids = [call("POST", "/api/clients", admin, json={
+        "company_name": name, "project_type": "Web", "budget": 1000.0 * (i + 1), "monthly_fee": 100.0
+    })["client_id"] for i, name in enumerate(("Acme SRL", "Beta SA", "Gama Design"))]
+    folder_id = call("POST", "/api/folders", admin, json={"name": "Contracte", "client_id": client_ids[0]})["folder_id"]
+    document_id = call("POST", "/api/documents", admin, json={
+        "name": "contract.txt", "file_data": "Y29udHJhY3Q=", "file_type": "text/plain", "folder_id": folder_id
+    })["document_id"]
+
+    note_ids = [call("POST", "/api/notes", headers, json={
+        "title": f"Notiță {i}", "content": "Factura trebuie trimisă", "color": ("default", "yellow")[i % 2]
+    })["note_id"] for i, headers in enumerate((admin, employee, admin))]
+    report_id = call("POST", "/api/reports", employee, json={
+        "date": TODAY.isoformat(), "content": "Am lucrat la factura clientului"
+    })["report_id"]
+    call("POST", "/api/reports", employee, json={
+        "date": (TODAY - timedelta(days=1)).isoformat(), "content": "Întâlnire cu echipa"
+    })
+
+    return {
+        "headers": {"admin": admin, "employee": employee},
+        "ids": {
+            "employee_id": employee_id, "task_id": task_ids[0], "client_id": client_ids[0],
+            "folder_id": folder_id, "document_id": document_id, "note_id": note_ids[0], "report_id": report_id,
+            "today": TODAY.isoformat(), "next_week": (TODAY + timedelta(days=7)).isoformat(),
+            "yesterday": (TODAY - timedelta(days=1)).isoformat(),
+        },
+    }
@@ -0,0 +1,78 @@
+"""Behaviour of individual endpoints, on the shared app and seed from conftest.py."""
+import uuid
+
+import pytest
+
+import server
+
+
+def test_dashboard_counts_monthly_fees(api, call, seed):
+    admin = seed["headers"]["admin"]
+    server.dashboard_cache.clear()
+    before = call("GET", "/api/dashboard/stats", admin)["monthly_revenue"]
+
+    call("POST", "/api/clients", admin, json={
+        "company_name": "Mentenanță Delta", "project_type": "Web", "budget": 500.0, "monthly_fee": 250.0
+    })
+    call("POST", "/api/clients", admin, json={
+        "company_name": "Mentenanță Epsilon", "project_type": "Web", "budget": 500.0, "monthly_fee": 80.0,
+        "status": "inactiv"
+    })
+
+    server.dashboard_cache.clear()
+    assert call("GET", "/api/dashboard/stats", admin)["monthly_revenue"] == before + 250.0
+
+
+def test_trends_record_active_mrr(api, call, seed):
+    admin = seed["headers"]["admin"]
+    call("POST", "/api/clients", admin, json={
+        "company_name": "Mentenanță Zeta", "project_type": "Web", "budget": 500.0, "monthly_fee": 120.0
+    })
+    server.dashboard_cache.clear()
+    mrr = call("GET", "/api/dashboard/stats", admin)["monthly_revenue"]
+    assert mrr > 0
+
+    api.portal.call(server.update_rollups)
+    series = call("GET", "/api/dashboard/trends?period=week&periods=1", admin)["series"]
+    assert series[-1]["active_mrr"] == mrr
+
+
+
+@pytest.mark.parametrize("path", [
+    "/api/users?fields=id,updated_at",
+    "/api/tasks?fields=id,updated_at",
+    "/api/clients?fields=id,updated_at",
+    "/api/reports?fields=id,updated_at",
+    "/api/documents?folder_id={folder_id}&fields=id,updated_at",
+])
+def test_fieldsets_accept_stored_only_fields(call, seed, path):
+    items = call("GET", path.format(**seed["ids"]), seed["headers"]["admin"])
+    assert items
+    for item in items:
+        assert set(item) == {"id", "updated_at"}
+
+
+@pytest.mark.parametrize("types,status", [
+    ("clients", 200), ("clients,tasks", 200), ("clientsss", 400), ("client", 400), ("clients,notes", 400), (",", 400),
+])
+def test_autocomplete_types(api, seed, types, status):
+    response = api.get("/api/autocomplete", params={"q": "ac", "types": types}, headers=seed["headers"]["admin"])
+    assert response.status_code == status, response.text
+
+
+@pytest.mark.parametrize("path,key", [
+    ("/api/workload?start={today}&end={next_week}", "employees"),
+    ("/api/workload/free?start={today}&end={next_week}", None),
+])
+def test_workload_lists_employees_only(call, seed, path, key):
+    admin = seed["headers"]["admin"]
+    # Free for any range: no tasks
+    call("POST", "/api/users", admin, json={
+        "email": f"liber-{uuid.uuid4().hex[:8]}@budget.ro", "password": "parola", "name": "Liber"
+    })
+    employees = {u["id"] for u in call("GET", "/api/users", admin) if u["role"] == "employee"}
+
+    result = call("GET", path.format(**seed["ids"]), admin)
+    listed = {row.get("user_id") or row.get("id") for row in (result[key] if key else result)}
+    assert listed
+    assert listed <= employees
@@ -0,0 +1,145 @@
+"""Mongo query budgets and index use for the read endpoints.
+
+Uses the shared app and seed from conftest.py, with QUERY_DEBUG on. Every
+endpoint must stay within its command budget, read from the X-Query-Count
+debug header, and every filtered or sorted read it issues must be answered
+from an index: its winning plan, re-checked with explain, may not contain a
+COLLSCAN. Unfiltered, unsorted reads of a whole collection are exempt.
+
+The budgets are the exact number of commands each endpoint issues for the
+seed in conftest.py; when a change moves one, run the module against a real
+mongod and take the count from the failure message. The run's header line
+names the mongod version; note it in the commit that changes a budget.
+"""
+import pytest
+
+import server
+
+# (role, path, maximum Mongo commands). Paths are formatted with the ids of
+# the seeded documents. The seed stays under one batch (101 documents) per
+# collection, so no getMore is counted.
+ENDPOINTS = [
+    ("admin", "/api/auth/me", 1),
+    ("admin", "/api/users", 1),
+    ("admin", "/api/users/{employee_id}", 1),
+    ("admin", "/api/tasks", 2),
+    ("admin", "/api/tasks/board", 5),
+    ("admin", "/api/tasks/{task_id}", 1),
+    ("admin", "/api/notes", 2),
+    ("admin", "/api/notes?color=yellow", 2),
+    ("admin", "/api/notes/{note_id}", 1),
+    ("admin", "/api/clients", 1),
+    ("admin", "/api/clients?status=activ&sort=budget", 1),
+    ("admin", "/api/clients?sort=name&order=asc", 1),
+    ("admin", "/api/clients/{client_id}", 1),
+    ("admin", "/api/clients/duplicates?name=Acme", 0),
+    ("admin", "/api/folders", 3),
+    ("admin", "/api/folders?client_id={client_id}", 3),
+    ("admin", "/api/documents?folder_id={folder_id}", 1),
+    ("admin", "/api/documents/{document_id}", 1),
+    ("admin", "/api/reports", 2),
+    ("admin", "/api/reports?date={today}", 2),
+    ("admin", "/api/reports/{report_id}", 1),
+    ("admin", "/api/dashboard/stats", 4),
+    ("admin", "/api/dashboard/trends", 2),
+    ("admin", "/api/dashboard/cycle-times", 1),
+    ("admin", "/api/notifications", 1),
+    ("admin", "/api/notifications/unread-count", 1),
+    ("admin", "/api/search?q=factura", 3),
+    ("admin", "/api/autocomplete?q=ac", 0),
+    ("admin", "/api/workload?start={today}&end={next_week}", 1),
+    ("admin", "/api/workload/free?start={today}&end={next_week}", 1),
+    ("admin", "/api/sync", 8),
+    ("admin", "/api/sync?since={yesterday}", 15),
+    ("admin", "/api/bootstrap", 7),
+    ("employee", "/api/auth/me", 1),
+    ("employee", "/api/tasks", 2),
+    ("employee", "/api/tasks/board", 5),
+    ("employee", "/api/reports", 2),
+    ("employee", "/api/dashboard/stats", 1),
+    ("employee", "/api/notifications", 1),
+    ("employee", "/api/search?q=factura", 3),
+    ("employee", "/api/sync?since={yesterday}", 9),
+    ("employee", "/api/bootstrap", 4),
+]
+
+# What explain needs from each read command; session and routing fields are dropped
+EXPLAIN_FIELDS = {
+    "find": ("find", "filter", "sort", "projection", "hint", "skip", "limit", "collation"),
+    "aggregate": ("aggregate", "pipeline", "cursor", "hint", "collation"),
+    "count": ("count", "query", "hint", "skip", "limit", "collation"),
+    "distinct": ("distinct", "key", "query", "collation"),
+}
+
+
+def needs_index(name, command):
+    if name == "find":
+        return bool(command.get("filter") or command.get("sort"))
+    if name in ("count", "distinct"):
+        return bool(command.get("query"))
+    if name == "aggregate":
+        stages = [stage for stage in command.get("pipeline", []) if stage != {"$match": {}}]
+        return bool(stages) and next(iter(stages[0])) in ("$match", "$sort")
+    return False
+
+
+def winning_plans(node):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "winningPlan":
+                yield value
+            else:
+                yield from winning_plans(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from winning_plans(item)
+
+
+def plan_stages(node):
+    if isinstance(node, dict):
+        for key, value in node.items():
+            if key == "stage":
+                yield value
+            else:
+                yield from plan_stages(value)
+    elif isinstance(node, list):
+        for item in node:
+            yield from plan_stages(item)
+
+
+@pytest.fixture
+def commands(monkeypatch):
+    # Full command documents of the requests made during one test
+    seen = []
+    listener = server.mongo_command_metrics
+    started = listener.started
+
+    def recording_started(event):
+        started(event)
+        if server.request_queries.get() is not None:
+            seen.append((event.command_name, dict(event.command)))
+
+    monkeypatch.setattr(listener, "started", recording_started)
+    return seen
+
+
+@pytest.mark.parametrize("role,path,budget", ENDPOINTS, ids=[f"{role}:{path}" for role, path, _ in ENDPOINTS])
+def test_query_budget_and_plans(api, sync_db, seed, commands, role, path, budget):
+    # Cached results would hide the queries
+    server.dashboard_cache.clear()
+    response = api.get(path.format(**seed["ids"]), headers=seed["headers"][role])
+    assert response.status_code == 200, response.text
+
+    count = int(response.headers["X-Query-Count"])
+    assert count == len(commands)
+    assert count <= budget, f"{count} commands, budget {budget}: {response.headers['X-Queries']}"
+
+    for name, command in commands:
+        if name not in EXPLAIN_FIELDS or not needs_index(name, command):
+            continue
+        explained = {key: command[key] for key in EXPLAIN_FIELDS[name] if key in command}
+        explain = sync_db.command({"explain": explained, "verbosity": "queryPlanner"})
+        stages = {stage for plan in winning_plans(explain) for stage in plan_stages(plan)}
+        assert stages, f"no plan for {explained}"
+        assert "COLLSCAN" not in stages, f"collection scan for {explained}: {sorted(stages)}"
+